@@ -3,8 +3,22 @@ from django.shortcuts import redirect, reverse
 from django.templatetags.static import static
 from django.utils.html import format_html
 
-from .models import (Order, Product, ProductCategory, ProductQuantity,
-                     Restaurant, RestaurantMenuItem)
+from .models import (Banner, Order, Product, ProductCategory,
+                     ProductQuantity, Restaurant, RestaurantMenuItem)
+from .search import filter_by_search_text, uses_trigram_search
+
+
+class SearchTextMixin:
+    """
+    Поиск по `search_fields` там, где есть триграммные индексы (PostgreSQL),
+    и по заранее приведённой к нижнему регистру колонке `search_text`
+    на остальных базах: SQLite не умеет менять регистр кириллицы.
+    """
+
+    def get_search_results(self, request, queryset, search_term):
+        if uses_trigram_search() or not search_term:
+            return super().get_search_results(request, queryset, search_term)
+        return filter_by_search_text(queryset, search_term), False
 
 
 class ProductDetailsInline(admin.TabularInline):
@@ -17,16 +31,18 @@ class ProductDetailsInline(admin.TabularInline):
 class OrderAdmin(admin.ModelAdmin):
     inlines = (ProductDetailsInline, )
     list_display = [
-        'status', 'registered_at', 'address', 'phonenumber', 'price'
+        'status', 'registered_at', 'address', 'phonenumber', 'total_price'
     ]
     ordering = ['status', 'registered_at', ]
 
-    def get_queryset(self, request):
-        return Order.objects.with_prices()
-
-    @admin.display(description='стоимость заказа')
-    def price(self, obj):
-        return obj.price
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # товары заказа сохраняются после самого заказа,
+        # поэтому стоимость пересчитываем уже после них
+        form.instance.update_total_price()
+        products_changed = any(formset.has_changed() for formset in formsets)
+        if products_changed or 'address' in form.changed_data:
+            form.instance.mark_candidates_stale()
 
     def response_change(self, request, obj):
         return redirect("restaurateur:view_orders")
@@ -38,7 +54,7 @@ class RestaurantMenuItemInline(admin.TabularInline):
 
 
 @admin.register(Restaurant)
-class RestaurantAdmin(admin.ModelAdmin):
+class RestaurantAdmin(SearchTextMixin, admin.ModelAdmin):
     search_fields = [
         'name',
         'address',
@@ -55,7 +71,7 @@ class RestaurantAdmin(admin.ModelAdmin):
 
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(SearchTextMixin, admin.ModelAdmin):
     list_display = [
         'get_image_list_preview',
         'name',
@@ -69,8 +85,6 @@ class ProductAdmin(admin.ModelAdmin):
         'category',
     ]
     search_fields = [
-        # FIXME SQLite can not convert letter case for cyrillic words properly, so search will be buggy.
-        # Migration to PostgreSQL is necessary
         'name',
         'category__name',
     ]
@@ -129,3 +143,17 @@ class ProductAdmin(admin.ModelAdmin):
 
 
 admin.site.register(ProductCategory)
+
+
+@admin.register(Banner)
+class BannerAdmin(admin.ModelAdmin):
+    list_display = [
+        'title',
+        'text',
+        'order',
+        'is_active',
+    ]
+    list_editable = [
+        'order',
+        'is_active',
+    ]
@@ -0,0 +1,137 @@
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import RestaurantMenuItem
+from .shared_version import SharedVersion
+
+
+AVAILABILITY_MATRIX_VERSION_KEY = 'foodcartapp:availability_matrix_version'
+
+
+class AvailabilityMatrix:
+    """
+    Матрица «продукт × ресторан»: есть ли продукт в продаже в ресторане.
+
+    Каждый продукт хранит битовую маску ресторанов, где он сейчас в продаже,
+    бит ресторана — его порядковый номер в матрице. Строится лениво одним
+    запросом по пунктам меню, а дальше обновляется по одному пункту при
+    сохранении или удалении `RestaurantMenuItem` (см. foodcartapp.signals)
+    после коммита транзакции, в которой пункт меню сохранили.
+
+    Матрица у каждого процесса своя. Изменения пунктов меню поднимают общую
+    версию матрицы (см. SharedVersion), и остальные процессы её
+    пересобирают; кроме того, матрица пересобирается раз в
+    AVAILABILITY_MATRIX_TIMEOUT секунд. Массовые `update()`/`delete()` по
+    пунктам меню сигналов не шлют — после них матрицу нужно сбросить
+    во всех процессах через `reset()`.
+    """
+
+    def __init__(self):
+        self._built = False
+        self._version = SharedVersion(AVAILABILITY_MATRIX_VERSION_KEY,
+                                      settings.AVAILABILITY_MATRIX_TIMEOUT)
+        self._restaurant_bits = {}
+        self._product_masks = defaultdict(int)
+        self._items = {}
+        self._lock = threading.RLock()
+
+    def _build(self):
+        version = self._version.current()
+        self._restaurant_bits.clear()
+        self._product_masks.clear()
+        self._items.clear()
+        menu_items = RestaurantMenuItem.objects.values_list(
+            'id', 'product_id', 'restaurant_id', 'availability'
+        )
+        for item_id, product_id, restaurant_id, availability in menu_items:
+            self._set(item_id, product_id, restaurant_id, availability)
+        self._built = True
+        self._version.mark_built(version)
+
+    def _ensure_built(self):
+        with self._lock:
+            if not self._built or self._version.is_stale():
+                self._build()
+
+    def _bump(self):
+        """
+        Сообщает другим процессам об изменении меню. Возвращает True, если
+        матрицу этого процесса можно поправить на месте; иначе матрица
+        сбрасывается и пересоберётся при следующем запросе.
+        """
+        if self._version.bump() and self._built:
+            return True
+        self._built = False
+        return False
+
+    def _restaurant_bit(self, restaurant_id):
+        bit = self._restaurant_bits.get(restaurant_id)
+        if bit is None:
+            bit = 1 << len(self._restaurant_bits)
+            self._restaurant_bits[restaurant_id] = bit
+        return bit
+
+    def _set(self, item_id, product_id, restaurant_id, availability):
+        self._unset(item_id)
+        self._items[item_id] = (product_id, restaurant_id)
+        if availability:
+            self._product_masks[product_id] |= self._restaurant_bit(restaurant_id)
+
+    def _unset(self, item_id):
+        pair = self._items.pop(item_id, None)
+        if pair is None:
+            return
+        product_id, restaurant_id = pair
+        mask = self._product_masks.get(product_id, 0)
+        mask &= ~self._restaurant_bits.get(restaurant_id, 0)
+        if mask:
+            self._product_masks[product_id] = mask
+        else:
+            self._product_masks.pop(product_id, None)
+
+    def update_item(self, item):
+        values = (item.id, item.product_id, item.restaurant_id,
+                  item.availability)
+        transaction.on_commit(lambda: self._update_item(*values))
+
+    def _update_item(self, item_id, product_id, restaurant_id, availability):
+        with self._lock:
+            if self._bump():
+                self._set(item_id, product_id, restaurant_id, availability)
+
+    def remove_item(self, item_id):
+        transaction.on_commit(lambda: self._remove_item(item_id))
+
+    def _remove_item(self, item_id):
+        with self._lock:
+            if self._bump():
+                self._unset(item_id)
+
+    def availability_rows(self, product_ids, restaurant_ids):
+        """
+        Для каждого продукта — список флагов «в продаже» по ресторанам
+        в порядке `restaurant_ids`.
+        """
+        self._ensure_built()
+        with self._lock:
+            bits = [self._restaurant_bits.get(restaurant_id, 0)
+                    for restaurant_id in restaurant_ids]
+            rows = []
+            for product_id in product_ids:
+                mask = self._product_masks.get(product_id, 0)
+                rows.append([bool(mask & bit) for bit in bits])
+            return rows
+
+    def reset(self):
+        transaction.on_commit(self._reset)
+
+    def _reset(self):
+        with self._lock:
+            self._version.bump()
+            self._built = False
+
+
+availability_matrix = AvailabilityMatrix()
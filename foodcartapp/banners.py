@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Banner
+from .payloads import Payload
+
+
+BANNERS_CACHE_KEY = 'foodcartapp:banners'
+
+
+def get_banners():
+    """
+    Активные баннеры, собранные в JSON один раз и сохранённые в кеше.
+    Сбрасываются сигналами при изменении баннеров (см. foodcartapp.signals).
+    """
+    payload = cache.get(BANNERS_CACHE_KEY)
+    if payload is None:
+        banners = Banner.objects.filter(is_active=True)
+        payload = Payload.from_data([
+            {
+                'title': banner.title,
+                'src': banner.image.url,
+                'text': banner.text,
+            }
+            for banner in banners
+        ])
+        cache.set(BANNERS_CACHE_KEY, payload,
+                  timeout=settings.CATALOGUE_CACHE_TIMEOUT)
+    return payload
+
+
+def invalidate_banners():
+    cache.delete(BANNERS_CACHE_KEY)
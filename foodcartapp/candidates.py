@@ -0,0 +1,184 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from places.address import normalize_address
+from places.utils import geocode_cache
+from places.utils.distance_matrix import distance_matrix
+
+from .eligibility import EligibilityEngine
+from .metrics import (CANDIDATES_REFRESH_SECONDS,
+                      CANDIDATES_REFRESHED_ORDERS,
+                      ELIGIBILITY_BUILD_SECONDS)
+from .models import Order, OrderRestaurantCandidate, RestaurantMenuItem
+from .restaurant_index import restaurant_index
+
+
+def get_nearest_restaurants(eligibility, product_ids, address):
+    """
+    Не более MANAGER_ORDER_RESTAURANTS_LIMIT ближайших к адресу ресторанов,
+    в которых доступны все продукты из заказа, в виде пар (ресторан,
+    расстояние в км). Рестораны с неизвестными координатами — в конце списка
+    с расстоянием None.
+    """
+    limit = settings.MANAGER_ORDER_RESTAURANTS_LIMIT
+    restaurants = {
+        restaurant.id: restaurant
+        for restaurant in eligibility.restaurants_for(product_ids)
+    }
+    lon, lat = geocode_cache.get_coordinates(address)
+    nearest = []
+    if lon is not None and lat is not None:
+        nearest = restaurant_index.nearest_k(
+            lat, lon, limit, eligibility.predicate(product_ids)
+        )
+    if nearest and settings.DISTANCE_EXACT_GEODESIC:
+        distances = distance_matrix(
+            [(lon, lat)],
+            [geocode_cache.get_coordinates(restaurants[restaurant_id].address)
+             for restaurant_id, _ in nearest],
+            exact=True,
+        )[0]
+        nearest = sorted(zip((restaurant_id for restaurant_id, _ in nearest),
+                             distances.tolist()),
+                         key=lambda pair: pair[1])
+    nearest = [
+        (restaurants[restaurant_id], round(distance, 2))
+        for restaurant_id, distance in nearest
+    ]
+    unknown = [
+        (restaurant, None) for restaurant_id, restaurant in restaurants.items()
+        if lon is None or not restaurant_index.is_located(restaurant_id)
+    ]
+    return (nearest + unknown)[:limit]
+
+
+def refresh_candidates(orders):
+    """
+    Подбирает рестораны для заказов и сохраняет их в
+    OrderRestaurantCandidate. Продукты заказов должны быть получены заранее
+    через prefetch_related (см. OrderQuerySet.with_products).
+
+    Заказы, которые с выборки изменились или которым рестораны уже подобрал
+    параллельный запрос, пропускаются.
+    """
+    if not orders:
+        return
+    with CANDIDATES_REFRESH_SECONDS.time():
+        refreshed = _refresh_candidates(orders)
+    CANDIDATES_REFRESHED_ORDERS.inc(refreshed)
+
+
+def _refresh_candidates(orders):
+    with ELIGIBILITY_BUILD_SECONDS.time():
+        eligibility = EligibilityEngine(
+            RestaurantMenuItem.objects.get_available_menu()
+        )
+    restaurant_addreses = {
+        restaurant.address for restaurant in eligibility.restaurants
+    }
+    clients_addreses = {order.address for order in orders}
+    geocode_cache.warm(restaurant_addreses | clients_addreses)
+
+    candidates = []
+    for order in orders:
+        # продукты заказа уже получены через prefetch_related,
+        # поэтому здесь нет дополнительных запросов к БД
+        product_ids = {product.id for product in order.products.all()}
+        restaurants = get_nearest_restaurants(eligibility, product_ids,
+                                              order.address)
+        candidates.extend(
+            OrderRestaurantCandidate(order=order, restaurant=restaurant,
+                                     distance=distance, position=position)
+            for position, (restaurant, distance) in enumerate(restaurants)
+        )
+    loaded_at = {order.id: order.updated_at for order in orders}
+    with transaction.atomic():
+        # Заказы блокируются до конца транзакции, и рестораны сохраняются
+        # только тем, что всё ещё устарели и не менялись с выборки: если
+        # их уже обновил параллельный запрос, подобранное здесь не нужно,
+        # а если заказ снова пометили устаревшим, подобранное здесь неверно
+        locked_orders = (
+            Order.objects.select_for_update()
+            .filter(pk__in=list(loaded_at), candidates_stale=True)
+            .order_by('id')
+            .values_list('id', 'updated_at')
+        )
+        order_ids = {
+            order_id for order_id, updated_at in locked_orders
+            if updated_at == loaded_at[order_id]
+        }
+        OrderRestaurantCandidate.objects.filter(order__in=order_ids).delete()
+        OrderRestaurantCandidate.objects.bulk_create([
+            candidate for candidate in candidates
+            if candidate.order_id in order_ids
+        ])
+        # `updated_at` не трогаем: заказ уже попал в живую ленту, когда
+        # его рестораны пометили устаревшими
+        Order.objects.filter(pk__in=order_ids).update(candidates_stale=False)
+    for order in orders:
+        if order.id in order_ids:
+            order.candidates_stale = False
+    return len(order_ids)
+
+
+def refresh_stale_candidates(limit=None):
+    """Подбирает рестораны для необработанных заказов, где они устарели."""
+    orders = list(
+        Order.objects.with_products(processed=False)
+        .filter(candidates_stale=True)
+        .order_by('registered_at', 'id')[:limit]
+    )
+    refresh_candidates(orders)
+    return len(orders)
+
+
+def refresh_orders_candidates(order_ids):
+    """Как `refresh_stale_candidates`, но только для заказов `order_ids`."""
+    orders = list(
+        Order.objects.with_products(processed=False)
+        .filter(pk__in=order_ids, candidates_stale=True)
+        .order_by('registered_at', 'id')
+    )
+    refresh_candidates(orders)
+    return len(orders)
+
+
+def refresh_candidates_after_geocoding(addresses):
+    """
+    Подписчик фоновой очереди геокодирования: как только у адресов появились
+    координаты, подбираем рестораны для необработанных заказов с этими
+    адресами. Адреса сравниваются в нормализованном виде — так же, как
+    очередь отбрасывает повторы.
+    """
+    keys = {normalize_address(address) for address in addresses}
+    stale_orders = (
+        Order.objects
+        .filter(status=Order.OrderStatus.NOT_PROCESSED, candidates_stale=True)
+        .values_list('id', 'address')
+    )
+    refresh_orders_candidates([
+        order_id for order_id, address in stale_orders.iterator()
+        if normalize_address(address) in keys
+    ])
+
+
+def get_candidates(orders):
+    """
+    Сохранённые рестораны для заказов: {заказ: [(ресторан, расстояние)]}.
+    Для заказов, где рестораны устарели, они сперва подбираются заново.
+    """
+    refresh_candidates([order for order in orders if order.candidates_stale])
+    candidates = defaultdict(list)
+    saved_candidates = (
+        OrderRestaurantCandidate.objects
+        .filter(order__in=[order.id for order in orders])
+        .select_related('restaurant')
+        .only('order_id', 'distance', 'restaurant__name')
+    )
+    for candidate in saved_candidates:
+        candidates[candidate.order_id].append(
+            (candidate.restaurant, candidate.distance)
+        )
+    return {order: candidates[order.id] for order in orders}
@@ -0,0 +1,73 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Product
+from .payloads import Payload
+
+
+CATALOGUE_CACHE_KEY = 'foodcartapp:catalogue'
+
+
+def serialize_product(product):
+    category = product.category
+    return {
+        'id': product.id,
+        'name': product.name,
+        'price': product.price,
+        'special_status': product.special_status,
+        'description': product.description,
+        'category': {
+            'id': category.id,
+            'name': category.name,
+        } if category else None,
+        'image': product.image.url,
+        'restaurant': {
+            'id': product.id,
+            'name': product.name,
+        }
+    }
+
+
+def get_available_products():
+    return Product.objects.select_related('category').available()
+
+
+def get_catalogue():
+    """
+    Каталог доступных товаров, собранный один раз и сохранённый в кеше.
+    Сбрасывается сигналами при изменении товаров, категорий и меню
+    ресторанов (см. foodcartapp.signals).
+    """
+    payload = cache.get(CATALOGUE_CACHE_KEY)
+    if payload is None:
+        products = get_available_products()
+        payload = Payload.from_data(
+            [serialize_product(product) for product in products]
+        )
+        cache.set(CATALOGUE_CACHE_KEY, payload,
+                  timeout=settings.CATALOGUE_CACHE_TIMEOUT)
+    return payload
+
+
+def invalidate_catalogue():
+    cache.delete(CATALOGUE_CACHE_KEY)
+
+
+def stream_catalogue():
+    """
+    Каталог в виде потока кусков JSON-массива, по одному на товар.
+
+    Товары читаются из БД порциями через `iterator()`, поэтому память
+    не растёт с размером каталога, а первые байты ответа уходят клиенту
+    сразу после первой порции.
+    """
+    encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    products = get_available_products().iterator(
+        chunk_size=settings.CATALOGUE_STREAM_CHUNK_SIZE
+    )
+    yield b'['
+    for index, product in enumerate(products):
+        chunk = encoder.encode(serialize_product(product)).encode()
+        yield b',' + chunk if index else chunk
+    yield b']'
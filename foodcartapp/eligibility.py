@@ -0,0 +1,77 @@
+from collections import defaultdict
+
+
+class EligibilityEngine:
+    """
+    Отвечает на вопрос «какие рестораны могут приготовить весь заказ».
+
+    Меню разбирается один раз: каждому ресторану выдаётся свой бит, а каждому
+    продукту — маска ресторанов, где он сейчас в продаже. Множество ресторанов
+    для заказа — побитовое И масок его продуктов, т.е. проверка «заказ является
+    подмножеством меню ресторана» сразу для всех ресторанов.
+
+    Сборка движка — O(пунктов меню), ответ на заказ — O(позиций в заказе),
+    поэтому обработка всех заказов растёт линейно по заказам + размеру меню.
+    """
+
+    def __init__(self, menu_items):
+        self._restaurants = []
+        self._restaurant_bits = {}
+        self._product_masks = defaultdict(int)
+        for item in menu_items:
+            bit = self._register_restaurant(item.restaurant)
+            self._product_masks[item.product_id] |= bit
+
+    def _register_restaurant(self, restaurant):
+        bit = self._restaurant_bits.get(restaurant.id)
+        if bit is None:
+            bit = 1 << len(self._restaurants)
+            self._restaurant_bits[restaurant.id] = bit
+            self._restaurants.append(restaurant)
+        return bit
+
+    @property
+    def restaurants(self):
+        """Все рестораны, в которых есть хотя бы один доступный продукт."""
+        return list(self._restaurants)
+
+    def eligible_mask(self, product_ids):
+        product_ids = set(product_ids)
+        if not product_ids:
+            return 0
+        mask = -1
+        for product_id in product_ids:
+            mask &= self._product_masks.get(product_id, 0)
+            if not mask:
+                break
+        return mask
+
+    def restaurant_indexes_for(self, product_ids):
+        """
+        Позиции в `restaurants` тех ресторанов, в которых доступны
+        все продукты из `product_ids`.
+        """
+        mask = self.eligible_mask(product_ids)
+        indexes = []
+        while mask:
+            lowest_bit = mask & -mask
+            indexes.append(lowest_bit.bit_length() - 1)
+            mask ^= lowest_bit
+        return indexes
+
+    def restaurants_for(self, product_ids):
+        """Рестораны, в которых доступны все продукты из `product_ids`."""
+        return [
+            self._restaurants[index]
+            for index in self.restaurant_indexes_for(product_ids)
+        ]
+
+    def predicate(self, product_ids):
+        """
+        Функция от id ресторана: может ли он приготовить весь заказ.
+        Маска заказа считается один раз, сама проверка — одна битовая операция.
+        """
+        mask = self.eligible_mask(product_ids)
+        return lambda restaurant_id: bool(
+            mask & self._restaurant_bits.get(restaurant_id, 0)
+        )
@@ -0,0 +1,49 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from foodcartapp.models import Order
+
+
+def find_mismatched_orders():
+    orders = (
+        Order.objects
+        .with_calculated_total_price()
+        .values_list('id', 'total_price', 'calculated_total_price')
+        .iterator()
+    )
+    # сравниваем с точностью до копеек: SQLite считает сумму во float
+    cent = Decimal('0.01')
+    return [
+        (order_id, total_price, calculated)
+        for order_id, total_price, calculated in orders
+        if total_price.quantize(cent) != Decimal(calculated).quantize(cent)
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает сохранённую стоимость заказов по их товарам. '
+        'С --verify только проверяет, что сохранённая стоимость совпадает '
+        'с посчитанной'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true')
+
+    def handle(self, *args, **options):
+        if not options['verify']:
+            updated = Order.objects.update_total_prices()
+            self.stdout.write(f'Пересчитана стоимость {updated} заказов')
+
+        mismatched = find_mismatched_orders()
+        for order_id, total_price, calculated in mismatched[:20]:
+            self.stdout.write(
+                f'Заказ {order_id}: сохранено {total_price}, '
+                f'по товарам {calculated}'
+            )
+        if mismatched:
+            raise CommandError(
+                f'Стоимость не совпадает у {len(mismatched)} заказов'
+            )
+        self.stdout.write('Стоимость всех заказов совпадает с их товарами')
@@ -0,0 +1,106 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from foodcartapp.models import Product, Restaurant, RestaurantMenuItem
+
+
+def generate_catalogue(restaurants_count, products_count, density, rnd,
+                       batch_size=5000):
+    restaurants = Restaurant.objects.bulk_create(
+        Restaurant(name=f'Ресторан {number}')
+        for number in range(restaurants_count)
+    )
+    products = Product.objects.bulk_create(
+        (
+            Product(name=f'Продукт {number}', price=100, image='product.png')
+            for number in range(products_count)
+        ),
+        batch_size=batch_size,
+    )
+    if connection.features.can_return_rows_from_bulk_insert:
+        restaurant_ids = [restaurant.id for restaurant in restaurants]
+        product_ids = [product.id for product in products]
+    else:
+        restaurant_ids = list(
+            Restaurant.objects.order_by('-id')
+            .values_list('id', flat=True)[:restaurants_count]
+        )
+        product_ids = list(
+            Product.objects.order_by('-id')
+            .values_list('id', flat=True)[:products_count]
+        )
+    menu_items = (
+        RestaurantMenuItem(restaurant_id=restaurant_id,
+                           product_id=product_id,
+                           availability=rnd.random() < 0.5)
+        for restaurant_id in restaurant_ids
+        for product_id in product_ids
+        if rnd.random() < density
+    )
+    RestaurantMenuItem.objects.bulk_create(menu_items, batch_size=batch_size)
+
+
+def time_query(queryset, repeat):
+    timings = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        rows = len(queryset.values_list('id', flat=True))
+        timings.append(time.perf_counter() - started_at)
+    return rows, min(timings), sum(timings) / len(timings)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает старый (pk__in по пунктам меню) и новый (EXISTS) запрос '
+        'доступных продуктов на сгенерированном каталоге: план запроса и '
+        'время. Каталог создаётся в транзакции, которая затем откатывается'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--restaurants', type=int, default=200)
+        parser.add_argument('--products', type=int, default=10000)
+        parser.add_argument('--density', type=float, default=0.1)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        queries = {
+            'pk__in': Product.objects.filter(pk__in=(
+                RestaurantMenuItem.objects
+                .filter(availability=True)
+                .values_list('product')
+            )),
+            'exists': Product.objects.available(),
+        }
+        with transaction.atomic():
+            started_at = time.perf_counter()
+            generate_catalogue(options['restaurants'],
+                               options['products'],
+                               options['density'],
+                               random.Random(options['seed']))
+            self.stdout.write(
+                f'Каталог: {options["restaurants"]} ресторанов × '
+                f'{options["products"]} продуктов, '
+                f'{RestaurantMenuItem.objects.count()} пунктов меню, '
+                f'сгенерирован за {time.perf_counter() - started_at:.1f} с'
+            )
+            with connection.cursor() as cursor:
+                # чтобы планировщик знал о свежесгенерированных данных
+                cursor.execute('ANALYZE')
+
+            results = {}
+            for name, queryset in queries.items():
+                self.stdout.write(f'\n{name}:\n{queryset.explain()}')
+                results[name] = time_query(queryset, options['repeat'])
+
+            self.stdout.write(
+                f'\n{"запрос":>8} {"строк":>8} {"мин, мс":>10} {"сред, мс":>10}'
+            )
+            for name, (rows, best, mean) in results.items():
+                self.stdout.write(
+                    f'{name:>8} {rows:>8} {best * 1000:>10.1f} {mean * 1000:>10.1f}'
+                )
+            transaction.set_rollback(True)
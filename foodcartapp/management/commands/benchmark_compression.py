@@ -0,0 +1,63 @@
+import gzip
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+
+from foodcartapp.banners import get_banners
+from foodcartapp.catalogue import get_catalogue
+from foodcartapp.payloads import brotli
+from foodcartapp.views import banners_list_api, product_list_api
+
+
+def measure(callback, repeat):
+    started_at = time.process_time()
+    for _ in range(repeat):
+        callback()
+    return (time.process_time() - started_at) / repeat * 1_000_000
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает, сколько байт экономит заранее сжатый ответ '
+        '/api/products/ и /api/banners/ и сколько процессорного времени '
+        'уходит на запрос по сравнению со сжатием на лету'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        factory = RequestFactory()
+        endpoints = [
+            ('/api/products/', product_list_api, get_catalogue()),
+            ('/api/banners/', banners_list_api, get_banners()),
+        ]
+        for url, view, payload in endpoints:
+            self.stdout.write(f'{url}: без сжатия {len(payload.body)} байт')
+            for encoding, body in payload.variants.items():
+                saved = 100 - len(body) / len(payload.body) * 100
+                self.stdout.write(
+                    f'  {encoding}: {len(body)} байт, экономия {saved:.1f}%'
+                )
+
+            for encoding in [None, *payload.variants]:
+                request = factory.get(url,
+                                      HTTP_ACCEPT_ENCODING=encoding or '')
+                cpu = measure(lambda: view(request), repeat)
+                self.stdout.write(
+                    f'  CPU на запрос ({encoding or "без сжатия"}, заранее): '
+                    f'{cpu:.0f} мкс'
+                )
+
+            on_the_fly = {
+                'gzip': lambda: gzip.compress(payload.body),
+            }
+            if brotli is not None:
+                on_the_fly['br'] = lambda: brotli.compress(payload.body)
+            for encoding, callback in on_the_fly.items():
+                cpu = measure(callback, repeat)
+                self.stdout.write(
+                    f'  CPU на сжатие {encoding} на лету: {cpu:.0f} мкс'
+                )
@@ -0,0 +1,77 @@
+import random
+import time
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+
+from foodcartapp.eligibility import EligibilityEngine
+
+
+def generate_menu(restaurants_count, products_count, density, rnd):
+    restaurants = [
+        SimpleNamespace(id=restaurant_id, name=f'Ресторан {restaurant_id}')
+        for restaurant_id in range(1, restaurants_count + 1)
+    ]
+    return [
+        SimpleNamespace(restaurant=restaurant, product_id=product_id)
+        for restaurant in restaurants
+        for product_id in range(1, products_count + 1)
+        if rnd.random() < density
+    ]
+
+
+def generate_orders(orders_count, products_count, max_lines, rnd):
+    return [
+        rnd.sample(range(1, products_count + 1), rnd.randint(1, max_lines))
+        for _ in range(orders_count)
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время подбора ресторанов для заказов на синтетических '
+        'данных. На каждом шаге число продуктов в меню и число заказов '
+        'удваивается, время на строку должно оставаться примерно постоянным'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--restaurants', type=int, default=50)
+        parser.add_argument('--products', type=int, default=200)
+        parser.add_argument('--orders', type=int, default=500)
+        parser.add_argument('--density', type=float, default=0.9)
+        parser.add_argument('--max-lines', type=int, default=5)
+        parser.add_argument('--steps', type=int, default=4)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        self.stdout.write(
+            f'{"меню":>10} {"заказы":>10} {"сборка, мс":>12} '
+            f'{"подбор, мс":>12} {"мкс на строку":>14}'
+        )
+        for step in range(options['steps']):
+            scale = 2 ** step
+            products_count = options['products'] * scale
+            menu = generate_menu(options['restaurants'],
+                                 products_count,
+                                 options['density'],
+                                 rnd)
+            orders = generate_orders(options['orders'] * scale,
+                                     products_count,
+                                     options['max_lines'],
+                                     rnd)
+
+            started_at = time.perf_counter()
+            engine = EligibilityEngine(menu)
+            built_at = time.perf_counter()
+            for product_ids in orders:
+                engine.restaurants_for(product_ids)
+            finished_at = time.perf_counter()
+
+            per_row = (finished_at - started_at) / (len(menu) + len(orders))
+            self.stdout.write(
+                f'{len(menu):>10} {len(orders):>10} '
+                f'{(built_at - started_at) * 1000:>12.1f} '
+                f'{(finished_at - built_at) * 1000:>12.1f} '
+                f'{per_row * 1_000_000:>14.2f}'
+            )
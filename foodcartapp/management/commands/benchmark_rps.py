@@ -0,0 +1,135 @@
+import io
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+BENCHMARK_USERNAME = 'benchmark-manager'
+
+
+def make_environ(path, host, cookie):
+    return {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': host,
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': host,
+        'HTTP_COOKIE': cookie,
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Считает, сколько запросов в секунду выдерживает страница, '
+        'с закрытием соединения с БД после каждого запроса '
+        '(CONN_MAX_AGE=0) и с постоянными соединениями из настроек. '
+        'Запросы идут через WSGI-обработчик Django, как от gunicorn, '
+        'поэтому соединения открываются и закрываются как на сервере'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/manager/products/')
+        parser.add_argument('--requests', type=int, default=300)
+        parser.add_argument('--concurrency', type=int, default=4)
+
+    def handle(self, *args, **options):
+        database = connections.databases[DEFAULT_DB_ALIAS]
+        conn_max_age = database['CONN_MAX_AGE']
+        if not conn_max_age:
+            raise CommandError(
+                'Постоянные соединения выключены, задайте DB_CONN_MAX_AGE'
+            )
+        self.handler = WSGIHandler()
+        self.host = next(
+            (host.lstrip('.') for host in settings.ALLOWED_HOSTS
+             if host != '*'),
+            'localhost',
+        )
+        manager, created = User.objects.get_or_create(
+            username=BENCHMARK_USERNAME, defaults={'is_staff': True},
+        )
+        session = SessionStore()
+        session[SESSION_KEY] = str(manager.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = manager.get_session_auth_hash()
+        session.create()
+        self.cookie = f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+
+        self.stdout.write(
+            f'{options["path"]}: запросов {options["requests"]}, '
+            f'потоков {options["concurrency"]}'
+        )
+        try:
+            for max_age in [0, conn_max_age]:
+                connections.close_all()
+                database['CONN_MAX_AGE'] = max_age
+                rps, latency = self.run(options)
+                self.stdout.write(
+                    f'CONN_MAX_AGE={max_age}: {rps:.0f} запросов/с, '
+                    f'в среднем {latency * 1000:.1f} мс на запрос'
+                )
+        finally:
+            database['CONN_MAX_AGE'] = conn_max_age
+            session.delete()
+            if created:
+                manager.delete()
+
+    def request(self, path):
+        status = []
+        response = self.handler(
+            make_environ(path, self.host, self.cookie),
+            lambda response_status, headers: status.append(response_status),
+        )
+        try:
+            for _ in response:
+                pass
+        finally:
+            # как и WSGI-сервер: закрытие ответа шлёт request_finished,
+            # по которому Django закрывает устаревшие соединения
+            response.close()
+        if not status[0].startswith('200'):
+            raise CommandError(f'{path}: ответ {status[0]}')
+
+    def run(self, options):
+        requests_count = options['requests']
+        concurrency = options['concurrency']
+
+        def worker(count):
+            try:
+                latencies = []
+                for _ in range(count):
+                    started_at = time.perf_counter()
+                    self.request(options['path'])
+                    latencies.append(time.perf_counter() - started_at)
+                return latencies
+            finally:
+                connections.close_all()
+
+        counts = [
+            requests_count // concurrency
+            + (1 if worker_number < requests_count % concurrency else 0)
+            for worker_number in range(concurrency)
+        ]
+        started_at = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(worker, counts))
+        elapsed = time.perf_counter() - started_at
+        latencies = [latency for result in results for latency in result]
+        return len(latencies) / elapsed, sum(latencies) / len(latencies)
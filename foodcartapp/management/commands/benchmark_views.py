@@ -0,0 +1,221 @@
+import json
+import math
+import platform
+import time
+import tracemalloc
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from foodcartapp.models import Product
+from places.models import Place
+
+
+METRICS = ['p50_ms', 'p95_ms', 'queries', 'peak_memory_kb']
+
+
+def percentile(values, percent):
+    """Перцентиль по методу ближайшего ранга."""
+    values = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+def read_response(response):
+    if response.streaming:
+        return b''.join(response.streaming_content)
+    return response.content
+
+
+class Scenario:
+    def __init__(self, name, send):
+        self.name = name
+        self.send = send
+
+    def request(self, client):
+        response = self.send(client)
+        read_response(response)
+        if response.status_code >= 400:
+            raise CommandError(
+                f'{self.name}: ответ {response.status_code}'
+            )
+        return response
+
+
+def make_scenarios():
+    products = list(
+        Product.objects.available().order_by('id').values_list('id', flat=True)[:3]
+    )
+    if not products:
+        raise CommandError(
+            'В базе нет доступных продуктов, запустите с --generate'
+        )
+    place = Place.objects.exclude(latitude=None).first()
+    order = {
+        'products': [{'product': product_id, 'quantity': 1}
+                     for product_id in products],
+        'firstname': 'Иван',
+        'lastname': 'Петров',
+        'phonenumber': '+79161234567',
+        'address': place.address if place else 'Москва, Тверская, д. 1',
+    }
+    return [
+        Scenario('product_list_api',
+                 lambda client: client.get('/api/products/')),
+        Scenario('register_order',
+                 lambda client: client.post('/api/order/', order,
+                                            content_type='application/json')),
+        Scenario('view_orders',
+                 lambda client: client.get('/manager/orders/')),
+        Scenario('view_products',
+                 lambda client: client.get('/manager/products/')),
+    ]
+
+
+def run_scenario(scenario, client, requests_count, warmup, memory_runs):
+    for _ in range(warmup):
+        scenario.request(client)
+
+    timings = []
+    queries = []
+    for _ in range(requests_count):
+        with CaptureQueriesContext(connection) as captured:
+            started_at = time.perf_counter()
+            scenario.request(client)
+            timings.append(time.perf_counter() - started_at)
+        queries.append(len(captured))
+
+    # tracemalloc сильно замедляет запросы, поэтому память меряем отдельно
+    peak_memory = 0
+    tracemalloc.start()
+    try:
+        for _ in range(memory_runs):
+            tracemalloc.reset_peak()
+            scenario.request(client)
+            peak_memory = max(peak_memory, tracemalloc.get_traced_memory()[1])
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'requests': requests_count,
+        'p50_ms': percentile(timings, 50) * 1000,
+        'p95_ms': percentile(timings, 95) * 1000,
+        'mean_ms': sum(timings) / len(timings) * 1000,
+        'queries': max(queries),
+        'peak_memory_kb': peak_memory / 1024,
+    }
+
+
+def find_regressions(results, baseline, threshold):
+    """
+    Метрики, которые хуже базовых: число запросов к БД — при любом росте,
+    время и память — если выросли больше чем на `threshold` процентов.
+    """
+    regressions = []
+    for name, metrics in results.items():
+        base_metrics = baseline.get(name)
+        if not base_metrics:
+            continue
+        for metric in METRICS:
+            value = metrics[metric]
+            base = base_metrics.get(metric)
+            if base is None:
+                continue
+            allowed = base if metric == 'queries' else base * (1 + threshold / 100)
+            if value > allowed:
+                regressions.append((name, metric, base, value))
+    return regressions
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогоняет /api/products/, /api/order/, /manager/orders/ и '
+        '/manager/products/ через тестовый клиент и показывает p50/p95 '
+        'времени ответа, число запросов к БД и пиковую память на запрос. '
+        'Всё выполняется в транзакции, которая затем откатывается. '
+        'Результаты можно сохранить в JSON и сравнить с сохранёнными ранее'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--memory-runs', type=int, default=3)
+        parser.add_argument('--generate', action='store_true',
+                            help='сначала сгенерировать данные командой '
+                                 'generate_load_data')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='куда сохранить результаты')
+        parser.add_argument('--baseline',
+                            help='JSON с результатами для сравнения')
+        parser.add_argument('--threshold', type=float, default=20,
+                            help='допустимый рост времени и памяти, %%')
+
+    def handle(self, *args, **options):
+        with override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']
+        ), transaction.atomic():
+            results = self.run(options)
+            transaction.set_rollback(True)
+
+        self.stdout.write(
+            f'{"сценарий":>18} {"p50, мс":>9} {"p95, мс":>9} '
+            f'{"запросов":>9} {"память, КБ":>11}'
+        )
+        for name, metrics in results.items():
+            self.stdout.write(
+                f'{name:>18} {metrics["p50_ms"]:>9.1f} '
+                f'{metrics["p95_ms"]:>9.1f} {metrics["queries"]:>9} '
+                f'{metrics["peak_memory_kb"]:>11.0f}'
+            )
+
+        if options['output']:
+            report = {
+                'created_at': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'results': results,
+            }
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Результаты сохранены в {options["output"]}')
+
+        if options['baseline']:
+            self.compare(results, options['baseline'], options['threshold'])
+
+    def run(self, options):
+        if options['generate']:
+            call_command('generate_load_data', seed=options['seed'],
+                         stdout=self.stdout)
+        manager, _ = User.objects.get_or_create(
+            username='benchmark-manager',
+            defaults={'is_staff': True},
+        )
+        client = Client()
+        client.force_login(manager)
+        return {
+            scenario.name: run_scenario(scenario, client,
+                                        options['requests'],
+                                        options['warmup'],
+                                        options['memory_runs'])
+            for scenario in make_scenarios()
+        }
+
+    def compare(self, results, baseline_path, threshold):
+        with open(baseline_path) as baseline_file:
+            baseline = json.load(baseline_file)['results']
+        regressions = find_regressions(results, baseline, threshold)
+        for name, metric, base, value in regressions:
+            self.stdout.write(f'{name}: {metric} {base:.1f} → {value:.1f}')
+        if regressions:
+            raise CommandError(
+                f'Метрики хуже базовых ({baseline_path}): {len(regressions)}'
+            )
+        self.stdout.write(f'Регрессий относительно {baseline_path} нет')
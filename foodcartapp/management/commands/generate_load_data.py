@@ -0,0 +1,178 @@
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from foodcartapp.availability import availability_matrix
+from foodcartapp.models import (Order, Product, ProductCategory,
+                                ProductQuantity, Restaurant,
+                                RestaurantMenuItem)
+from foodcartapp.restaurant_index import restaurant_index
+from places.address import normalize_address
+from places.models import Place
+
+
+# примерные границы Москвы, внутри которых разбрасываются адреса
+LATITUDES = (55.57, 55.91)
+LONGITUDES = (37.37, 37.84)
+
+STREETS = [
+    'Тверская', 'Арбат', 'Мясницкая', 'Покровка', 'Сретенка', 'Маросейка',
+    'Пятницкая', 'Остоженка', 'Пречистенка', 'Солянка', 'Варварка',
+    'Ленинский проспект', 'Профсоюзная', 'Новый Арбат', 'Ордынка',
+]
+FIRSTNAMES = ['Иван', 'Пётр', 'Анна', 'Мария', 'Олег', 'Елена', 'Сергей']
+LASTNAMES = ['Иванов', 'Петров', 'Сидоров', 'Смирнов', 'Кузнецов', 'Попов']
+
+
+def bulk_create_with_ids(model, objects, batch_size):
+    """
+    `bulk_create`, после которого у объектов гарантированно есть id,
+    даже если база не умеет возвращать строки из массовой вставки.
+    """
+    objects = model.objects.bulk_create(objects, batch_size=batch_size)
+    if not connection.features.can_return_rows_from_bulk_insert:
+        ids = (
+            model.objects.order_by('-id')
+            .values_list('id', flat=True)[:len(objects)]
+        )
+        for obj, object_id in zip(objects, reversed(ids)):
+            obj.id = object_id
+    return objects
+
+
+def with_search_text(objects):
+    """bulk_create не шлёт pre_save, поэтому текст для поиска — вручную."""
+    for obj in objects:
+        obj.search_text = obj.build_search_text()
+    return objects
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими данными для нагрузочного '
+        'тестирования: рестораны, продукты, меню с заданной плотностью и '
+        'заказы с товарами. Адресам сразу проставляются координаты, '
+        'геокодер не нужен. При одном и том же --seed данные одинаковые. '
+        'Данные добавляются к существующим. Индекс ресторанов и матрица '
+        'доступности сбрасываются во всех процессах сервера, если у них '
+        'общий кеш; иначе сервер подхватит данные через '
+        'RESTAURANT_INDEX_TIMEOUT и AVAILABILITY_MATRIX_TIMEOUT секунд'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--restaurants', type=int, default=50)
+        parser.add_argument('--products', type=int, default=500)
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--density', type=float, default=0.5,
+                            help='доля пар ресторан × продукт в меню')
+        parser.add_argument('--unavailable', type=float, default=0.1,
+                            help='доля пунктов меню не в продаже')
+        parser.add_argument('--orders', type=int, default=1000)
+        parser.add_argument('--max-lines', type=int, default=5)
+        parser.add_argument('--addresses', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        batch_size = options['batch_size']
+        started_at = time.perf_counter()
+
+        with transaction.atomic():
+            addresses = self.create_places(options['addresses'], rnd,
+                                           batch_size)
+            restaurants = [
+                Restaurant(name=f'Star Burger {number}',
+                           address=rnd.choice(addresses),
+                           contact_phone=f'+7495{number:07d}')
+                for number in range(options['restaurants'])
+            ]
+            restaurants = bulk_create_with_ids(
+                Restaurant, with_search_text(restaurants), batch_size
+            )
+            categories = bulk_create_with_ids(ProductCategory, (
+                ProductCategory(name=f'Категория {number}')
+                for number in range(options['categories'])
+            ), batch_size)
+            products = [
+                Product(name=f'Продукт {number}',
+                        category=rnd.choice(categories) if categories else None,
+                        price=Decimal(rnd.randrange(5000, 100000)) / 100,
+                        image='product.png')
+                for number in range(options['products'])
+            ]
+            products = bulk_create_with_ids(
+                Product, with_search_text(products), batch_size
+            )
+            menu_items = RestaurantMenuItem.objects.bulk_create((
+                RestaurantMenuItem(
+                    restaurant=restaurant,
+                    product=product,
+                    availability=rnd.random() >= options['unavailable'],
+                )
+                for restaurant in restaurants
+                for product in products
+                if rnd.random() < options['density']
+            ), batch_size=batch_size)
+            lines_count = self.create_orders(options['orders'], products,
+                                             addresses, options['max_lines'],
+                                             rnd, batch_size)
+        # bulk_create не шлёт сигналов, которые обновляют индексы
+        restaurant_index.reset()
+        availability_matrix.reset()
+
+        self.stdout.write(
+            f'Создано за {time.perf_counter() - started_at:.1f} с: '
+            f'{len(addresses)} адресов, {len(restaurants)} ресторанов, '
+            f'{len(products)} продуктов, {len(menu_items)} пунктов меню, '
+            f'{options["orders"]} заказов ({lines_count} позиций)'
+        )
+
+    def create_places(self, count, rnd, batch_size):
+        addresses = [
+            f'Москва, {rnd.choice(STREETS)}, д. {number + 1}'
+            for number in range(count)
+        ]
+        Place.objects.bulk_create((
+            Place(address=address,
+                  normalized_address=normalize_address(address),
+                  latitude=rnd.uniform(*LATITUDES),
+                  longitude=rnd.uniform(*LONGITUDES))
+            for address in addresses
+        ), batch_size=batch_size, ignore_conflicts=True)
+        return addresses
+
+    def create_orders(self, count, products, addresses, max_lines, rnd,
+                      batch_size):
+        if not products:
+            return 0
+        orders_lines = []
+        orders = []
+        for number in range(count):
+            lines = [
+                (product, rnd.randint(1, 3))
+                for product in rnd.sample(
+                    products, rnd.randint(1, min(max_lines, len(products)))
+                )
+            ]
+            orders_lines.append(lines)
+            orders.append(Order(
+                firstname=rnd.choice(FIRSTNAMES),
+                lastname=rnd.choice(LASTNAMES),
+                phonenumber=f'+7916{number:07d}',
+                address=rnd.choice(addresses),
+                status=rnd.choice(Order.OrderStatus.values),
+                total_price=sum(product.price * quantity
+                                for product, quantity in lines),
+            ))
+        orders = bulk_create_with_ids(Order, orders, batch_size)
+        order_lines = ProductQuantity.objects.bulk_create((
+            ProductQuantity(order=order, product=product, quantity=quantity,
+                            price=product.price)
+            for order, lines in zip(orders, orders_lines)
+            for product, quantity in lines
+        ), batch_size=batch_size)
+        return len(order_lines)
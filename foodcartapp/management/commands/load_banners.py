@@ -0,0 +1,38 @@
+import os
+
+from django.conf import settings
+from django.core.files import File
+from django.core.management.base import BaseCommand
+
+from foodcartapp.models import Banner
+
+
+BANNERS = [
+    ('Burger', 'burger.jpg', 'Tasty Burger at your door step'),
+    ('Spices', 'food.jpg', 'All Cuisines'),
+    ('New York', 'tasty.jpg', 'Food is incomplete without a tasty dessert'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт стандартные баннеры сайта, копируя их картинки из assets/ '
+        'в MEDIA_ROOT. Ничего не делает, если баннеры уже есть'
+    )
+
+    def handle(self, *args, **options):
+        if Banner.objects.exists():
+            self.stdout.write('Баннеры уже есть')
+            return
+        created = 0
+        for order, (title, filename, text) in enumerate(BANNERS):
+            path = os.path.join(settings.BASE_DIR, 'assets', filename)
+            if not os.path.exists(path):
+                self.stderr.write(f'Нет картинки {path}')
+                continue
+            banner = Banner(title=title, text=text, order=order)
+            with open(path, 'rb') as image:
+                banner.image.save(filename, File(image), save=False)
+            banner.save()
+            created += 1
+        self.stdout.write(f'Создано баннеров: {created}')
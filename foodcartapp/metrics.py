@@ -0,0 +1,19 @@
+from prometheus_client import Counter, Histogram
+
+
+ORDERS_REGISTERED = Counter(
+    'starburger_orders_registered_total',
+    'Принятые через API заказы',
+)
+ELIGIBILITY_BUILD_SECONDS = Histogram(
+    'starburger_eligibility_build_seconds',
+    'Сборка EligibilityEngine по доступному меню, включая запрос к БД',
+)
+CANDIDATES_REFRESH_SECONDS = Histogram(
+    'starburger_candidates_refresh_seconds',
+    'Подбор и сохранение ресторанов для партии заказов',
+)
+CANDIDATES_REFRESHED_ORDERS = Counter(
+    'starburger_candidates_refreshed_orders_total',
+    'Заказы, для которых заново подобраны рестораны',
+)
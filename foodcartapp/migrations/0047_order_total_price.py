@@ -0,0 +1,41 @@
+# Generated by Django 3.2 on 2026-10-18 07:09
+
+from django.db import migrations, models
+from django.db.models import (ExpressionWrapper, F, OuterRef, Subquery, Sum,
+                              Value)
+from django.db.models.functions import Coalesce
+
+
+def fill_total_price(apps, schema_editor):
+    Order = apps.get_model('foodcartapp', 'Order')
+    ProductQuantity = apps.get_model('foodcartapp', 'ProductQuantity')
+    lines_total = (
+        ProductQuantity.objects
+        .filter(order=OuterRef('pk'))
+        .values('order')
+        .annotate(total=Sum(ExpressionWrapper(
+            F('price') * F('quantity'), output_field=models.DecimalField()
+        )))
+        .values('total')
+    )
+    Order.objects.update(total_price=Coalesce(
+        Subquery(lines_total, output_field=models.DecimalField()),
+        Value(0),
+        output_field=models.DecimalField(),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0045_banner'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='total_price',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=0, editable=False, help_text='считается по товарам заказа при их сохранении', max_digits=10, verbose_name='стоимость заказа'),
+        ),
+        migrations.RunPython(fill_total_price, migrations.RunPython.noop),
+    ]
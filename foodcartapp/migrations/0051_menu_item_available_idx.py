@@ -0,0 +1,17 @@
+# Generated by Django 3.2 on 2026-10-18 07:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0050_order_restaurant_candidates'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='restaurantmenuitem',
+            index=models.Index(condition=models.Q(availability=True), fields=['product'], name='menu_item_available_idx'),
+        ),
+    ]
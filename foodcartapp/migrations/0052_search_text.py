@@ -0,0 +1,79 @@
+# Generated by Django 3.2 on 2026-10-18 07:23
+
+from django.db import migrations, models
+
+
+# (индекс, таблица, колонка) для поиска в админке через icontains,
+# который в PostgreSQL превращается в UPPER(колонка::text) LIKE UPPER(...)
+TRIGRAM_INDEXES = [
+    ('product_name_trgm_idx', 'foodcartapp_product', 'name'),
+    ('productcategory_name_trgm_idx', 'foodcartapp_productcategory', 'name'),
+    ('restaurant_name_trgm_idx', 'foodcartapp_restaurant', 'name'),
+    ('restaurant_address_trgm_idx', 'foodcartapp_restaurant', 'address'),
+    ('restaurant_phone_trgm_idx', 'foodcartapp_restaurant', 'contact_phone'),
+]
+
+
+def normalize_search_text(*parts):
+    text = ' '.join(part for part in parts if part)
+    return ' '.join(text.casefold().replace('ё', 'е').split())
+
+
+def fill_search_text(apps, schema_editor):
+    Product = apps.get_model('foodcartapp', 'Product')
+    Restaurant = apps.get_model('foodcartapp', 'Restaurant')
+
+    products = list(Product.objects.select_related('category'))
+    for product in products:
+        product.search_text = normalize_search_text(
+            product.name, product.category.name if product.category else ''
+        )
+    Product.objects.bulk_update(products, ['search_text'], batch_size=1000)
+
+    restaurants = list(Restaurant.objects.all())
+    for restaurant in restaurants:
+        restaurant.search_text = normalize_search_text(
+            restaurant.name, restaurant.address, restaurant.contact_phone
+        )
+    Restaurant.objects.bulk_update(restaurants, ['search_text'],
+                                   batch_size=1000)
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} '
+            f'USING gin (UPPER({column}::text) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0051_menu_item_available_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_text',
+            field=models.TextField(blank=True, editable=False, help_text='название товара и категории в нижнем регистре', verbose_name='текст для поиска'),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='search_text',
+            field=models.TextField(blank=True, editable=False, help_text='название, адрес и телефон в нижнем регистре', verbose_name='текст для поиска'),
+        ),
+        migrations.RunPython(fill_search_text, migrations.RunPython.noop),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
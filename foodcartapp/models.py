@@ -2,8 +2,13 @@ from phonenumber_field.modelfields import PhoneNumberField
 
 from django.core.validators import MinValueValidator
 from django.db import models
-from django.db.models import F, Sum
+from django.db.models import (Exists, ExpressionWrapper, F, OuterRef, Q,
+                              Subquery, Sum, Value)
+from django.db.models.functions import Coalesce
 from django.db.models.query import Prefetch
+from django.utils import timezone
+
+from .search import normalize_search_text
 
 
 class Restaurant(models.Model):
@@ -12,6 +17,12 @@ class Restaurant(models.Model):
     contact_phone = models.CharField('контактный телефон',
                                      max_length=50,
                                      blank=True)
+    search_text = models.TextField(
+        'текст для поиска',
+        blank=True,
+        editable=False,
+        help_text='название, адрес и телефон в нижнем регистре',
+    )
 
     class Meta:
         verbose_name = 'ресторан'
@@ -20,15 +31,18 @@ class Restaurant(models.Model):
     def __str__(self):
         return self.name
 
+    def build_search_text(self):
+        return normalize_search_text(self.name, self.address,
+                                     self.contact_phone)
+
 
 class ProductQuerySet(models.QuerySet):
     def available(self):
-        products = (
-            RestaurantMenuItem.objects
-            .filter(availability=True)
-            .values_list('product')
+        menu_items = RestaurantMenuItem.objects.filter(
+            product=OuterRef('pk'),
+            availability=True,
         )
-        return self.filter(pk__in=products)
+        return self.filter(Exists(menu_items))
 
 
 class ProductCategory(models.Model):
@@ -77,6 +91,12 @@ class Product(models.Model):
         max_length=200,
         blank=True,
     )
+    search_text = models.TextField(
+        'текст для поиска',
+        blank=True,
+        editable=False,
+        help_text='название товара и категории в нижнем регистре',
+    )
 
     objects = ProductQuerySet.as_manager()
 
@@ -87,6 +107,10 @@ class Product(models.Model):
     def __str__(self):
         return self.name
 
+    def build_search_text(self):
+        category_name = self.category.name if self.category_id else ''
+        return normalize_search_text(self.name, category_name)
+
 
 class RestuarantMenuQueryset(models.QuerySet):
     def get_available_menu(self):
@@ -124,25 +148,81 @@ class RestaurantMenuItem(models.Model):
         unique_together = [
             ['restaurant', 'product']
         ]
+        indexes = [
+            models.Index(
+                fields=['product'],
+                condition=Q(availability=True),
+                name='menu_item_available_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.restaurant.name} - {self.product.name}"
 
 
+def calculated_total_price():
+    """Стоимость заказа, посчитанная по его товарам, — подзапрос для Order."""
+    lines_total = (
+        ProductQuantity.objects
+        .filter(order=OuterRef('pk'))
+        .values('order')
+        .annotate(total=Sum(ExpressionWrapper(
+            F('price') * F('quantity'), output_field=models.DecimalField()
+        )))
+        .values('total')
+    )
+    return Coalesce(
+        Subquery(lines_total, output_field=models.DecimalField()),
+        Value(0),
+        output_field=models.DecimalField(),
+    )
+
+
 class OrderQuerySet(models.QuerySet):
-    def with_prices(self, processed=None):
-        status = [0, 1] if processed is None else [processed]
+    def with_products(self, processed=None):
         products = Product.objects.only('id')
-        return (
+        orders = (
             self.prefetch_related(Prefetch('products', queryset=products))
-                .defer('registered_at', 'delivered_at', 'called_at')
-                .filter(status__in=status)
-                .annotate(price=Sum(
-                    F('productquantity__price') *
-                    F('productquantity__quantity')
-                    )
-                )
+                .defer('delivered_at', 'called_at')
             )
+        if processed is not None:
+            orders = orders.filter(status=processed)
+        return orders
+
+    def after(self, registered_at, pk):
+        """
+        Заказы строго после заказа с данными `registered_at` и `pk`
+        в порядке (`registered_at`, `id`) — для постраничного вывода
+        без OFFSET.
+        """
+        return self.filter(
+            Q(registered_at__gt=registered_at)
+            | Q(registered_at=registered_at, pk__gt=pk)
+        )
+
+    def changed_after(self, updated_at, pk):
+        """
+        Заказы, изменённые строго после заказа с данными `updated_at` и `pk`,
+        в порядке (`updated_at`, `id`).
+        """
+        return self.filter(
+            Q(updated_at__gt=updated_at)
+            | Q(updated_at=updated_at, pk__gt=pk)
+        ).order_by('updated_at', 'id')
+
+    def mark_candidates_stale(self):
+        """
+        Помечает, что рестораны для заказов нужно подобрать заново.
+        `updated_at` тоже обновляется, чтобы заказы попали в живую ленту.
+        """
+        return self.update(candidates_stale=True, updated_at=timezone.now())
+
+    def with_calculated_total_price(self):
+        return self.annotate(calculated_total_price=calculated_total_price())
+
+    def update_total_prices(self):
+        """Пересчитывает `total_price` у заказов одним UPDATE."""
+        return self.update(total_price=calculated_total_price())
 
 
 class Order(models.Model):
@@ -180,12 +260,34 @@ class Order(models.Model):
     delivered_at = models.DateTimeField(verbose_name='когда доставили',
                                         blank=True,
                                         null=True)
+    updated_at = models.DateTimeField(verbose_name='когда изменён',
+                                      auto_now=True,
+                                      db_index=True)
+    candidates_stale = models.BooleanField(
+        'рестораны нужно подобрать заново',
+        default=True,
+        db_index=True,
+        editable=False,
+    )
+    total_price = models.DecimalField(
+        'стоимость заказа',
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        db_index=True,
+        editable=False,
+        help_text='считается по товарам заказа при их сохранении',
+    )
 
     objects = OrderQuerySet.as_manager()
 
     class Meta:
         verbose_name_plural = 'Заказы'
         verbose_name = 'Заказ'
+        indexes = [
+            models.Index(fields=['status', 'registered_at', 'id'],
+                         name='order_status_registered_idx'),
+        ]
 
     def __str__(self):
         return f'{self.firstname} {self.lastname}, {self.address}'
@@ -193,6 +295,14 @@ class Order(models.Model):
     def get_full_name(self):
         return f'{self.firstname} {self.lastname}'
 
+    def mark_candidates_stale(self):
+        Order.objects.filter(pk=self.pk).mark_candidates_stale()
+        self.candidates_stale = True
+
+    def update_total_price(self):
+        Order.objects.filter(pk=self.pk).update_total_prices()
+        self.refresh_from_db(fields=['total_price'])
+
 
 class ProductQuantity(models.Model):
     order = models.ForeignKey(to=Order, on_delete=models.CASCADE,
@@ -214,3 +324,49 @@ class ProductQuantity(models.Model):
     class Meta:
         verbose_name_plural = 'Продукт в заказе'
         verbose_name = 'Продукты в заказе'
+
+
+class Banner(models.Model):
+    title = models.CharField('заголовок', max_length=50)
+    image = models.ImageField('картинка', upload_to='banners')
+    text = models.CharField('текст', max_length=200, blank=True)
+    order = models.PositiveSmallIntegerField('порядок', default=0,
+                                             db_index=True)
+    is_active = models.BooleanField('показывать', default=True,
+                                    db_index=True)
+
+    class Meta:
+        verbose_name = 'баннер'
+        verbose_name_plural = 'баннеры'
+        ordering = ['order', 'id']
+
+    def __str__(self):
+        return self.title
+
+
+class OrderRestaurantCandidate(models.Model):
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.CASCADE,
+        related_name='restaurant_candidates',
+        verbose_name='заказ',
+    )
+    restaurant = models.ForeignKey(
+        Restaurant,
+        on_delete=models.CASCADE,
+        related_name='order_candidates',
+        verbose_name='ресторан',
+    )
+    distance = models.FloatField('расстояние, км', null=True, blank=True)
+    position = models.PositiveSmallIntegerField('место в списке')
+
+    class Meta:
+        verbose_name = 'ресторан для заказа'
+        verbose_name_plural = 'рестораны для заказов'
+        ordering = ['order', 'position']
+        unique_together = [
+            ['order', 'restaurant']
+        ]
+
+    def __str__(self):
+        return f'{self.order_id} - {self.restaurant_id}: {self.distance} км'
@@ -0,0 +1,99 @@
+import gzip
+import hashlib
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import http_date
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def compress(body):
+    """Сжатые варианты тела ответа: {кодировка: байты}."""
+    variants = {'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(body, quality=11)
+    return variants
+
+
+def parse_accept_encoding(header):
+    """Кодировки, которые клиент принимает (q > 0)."""
+    accepted = set()
+    for item in header.split(','):
+        encoding, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                continue
+        if encoding and quality > 0:
+            accepted.add(encoding.strip().lower())
+    return accepted
+
+
+@dataclass(frozen=True)
+class Payload:
+    """
+    Готовое к отдаче JSON-тело ответа вместе с его валидаторами и заранее
+    сжатыми вариантами, чтобы не сжимать тело заново на каждый запрос.
+    """
+
+    body: bytes
+    etag: str
+    last_modified: datetime
+    variants: dict = field(default_factory=dict)
+
+    # в порядке предпочтения
+    ENCODINGS = ('br', 'gzip')
+
+    @classmethod
+    def from_data(cls, data):
+        body = json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False,
+                          separators=(',', ':')).encode()
+        return cls(
+            body=body,
+            etag=hashlib.md5(body).hexdigest(),
+            last_modified=timezone.now().replace(microsecond=0),
+            variants=compress(body),
+        )
+
+    def choose_encoding(self, request):
+        accepted = parse_accept_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        for encoding in self.ENCODINGS:
+            if encoding in self.variants and (
+                    encoding in accepted or '*' in accepted):
+                return encoding
+        return None
+
+    def to_response(self, request):
+        encoding = self.choose_encoding(request)
+        # у каждого варианта тела свой ETag
+        etag = f'"{self.etag}-{encoding}"' if encoding else f'"{self.etag}"'
+        last_modified = int(self.last_modified.timestamp())
+        response = get_conditional_response(request, etag=etag,
+                                            last_modified=last_modified)
+        if response is None:
+            response = HttpResponse(
+                self.variants[encoding] if encoding else self.body,
+                content_type='application/json',
+            )
+            if encoding:
+                response['Content-Encoding'] = encoding
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, no_cache=True)
+        patch_vary_headers(response, ['Accept-Encoding'])
+        return response
@@ -0,0 +1,154 @@
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from places.utils import geocode_cache
+from places.address import normalize_address
+from places.utils.spatial_index import SpatialIndex
+
+from .models import Restaurant
+from .shared_version import SharedVersion
+
+
+RESTAURANT_INDEX_VERSION_KEY = 'foodcartapp:restaurant_index_version'
+
+
+class RestaurantIndex:
+    """
+    Пространственный индекс ресторанов по координатам их адресов.
+
+    Строится лениво при первом запросе, а дальше обновляется по одному
+    ресторану: при сохранении или удалении `Restaurant` и при изменении
+    `Place` с адресом ресторана (см. foodcartapp.signals). Изменения
+    применяются после коммита транзакции, в которой их сохранили: при
+    откате индекс не меняется, а другие процессы не пересоберут индекс
+    по ещё не закоммиченным данным.
+
+    Индекс у каждого процесса свой. Изменения ресторанов поднимают общую
+    версию индекса (см. SharedVersion), и остальные процессы его
+    пересобирают; кроме того, индекс пересобирается раз в
+    RESTAURANT_INDEX_TIMEOUT секунд. Правка `Place` видна другим процессам
+    только после такой пересборки.
+    """
+
+    def __init__(self):
+        self._index = None
+        self._version = SharedVersion(RESTAURANT_INDEX_VERSION_KEY,
+                                      settings.RESTAURANT_INDEX_TIMEOUT)
+        self._addresses = {}
+        self._restaurants_by_address = defaultdict(set)
+        self._lock = threading.RLock()
+
+    def _build(self):
+        version = self._version.current()
+        index = SpatialIndex()
+        restaurants = list(Restaurant.objects.only('id', 'address'))
+        geocode_cache.warm(restaurant.address for restaurant in restaurants)
+        self._index = index
+        self._addresses.clear()
+        self._restaurants_by_address.clear()
+        for restaurant in restaurants:
+            self._place(restaurant.id, restaurant.address,
+                        *geocode_cache.get_coordinates(restaurant.address))
+        self._version.mark_built(version)
+
+    def _ensure_built(self):
+        with self._lock:
+            if self._index is None or self._version.is_stale():
+                self._build()
+            return self._index
+
+    def _bump(self):
+        """
+        Сообщает другим процессам об изменении ресторанов. Возвращает True,
+        если индекс этого процесса можно поправить на месте; иначе индекс
+        сбрасывается и пересоберётся при следующем запросе.
+        """
+        if self._version.bump() and self._index is not None:
+            return True
+        self._index = None
+        return False
+
+    def _place(self, restaurant_id, address, lon, lat):
+        address = normalize_address(address)
+        self._unplace(restaurant_id)
+        self._addresses[restaurant_id] = address
+        self._restaurants_by_address[address].add(restaurant_id)
+        if lon is not None and lat is not None:
+            self._index.add(restaurant_id, lon, lat)
+
+    def _unplace(self, restaurant_id):
+        address = self._addresses.pop(restaurant_id, None)
+        if address is not None:
+            restaurant_ids = self._restaurants_by_address[address]
+            restaurant_ids.discard(restaurant_id)
+            if not restaurant_ids:
+                del self._restaurants_by_address[address]
+        self._index.remove(restaurant_id)
+
+    def update_restaurant(self, restaurant):
+        """Ресторан создан или у него поменялся адрес."""
+        restaurant_id, address = restaurant.id, restaurant.address
+        transaction.on_commit(
+            lambda: self._update_restaurant(restaurant_id, address)
+        )
+
+    def _update_restaurant(self, restaurant_id, address):
+        with self._lock:
+            if (self._index is not None
+                    and self._addresses.get(restaurant_id)
+                    == normalize_address(address)):
+                return
+            if self._bump():
+                self._place(restaurant_id, address,
+                            *geocode_cache.get_coordinates(address))
+
+    def remove_restaurant(self, restaurant_id):
+        transaction.on_commit(lambda: self._remove_restaurant(restaurant_id))
+
+    def _remove_restaurant(self, restaurant_id):
+        with self._lock:
+            if self._bump():
+                self._unplace(restaurant_id)
+
+    def update_place(self, place):
+        """
+        У адреса поменялись координаты. Другим процессам сообщается, только
+        если по адресу есть рестораны в индексе этого процесса.
+        """
+        address = place.normalized_address
+        point = (place.longitude, place.latitude)
+        transaction.on_commit(lambda: self._update_place(address, point))
+
+    def _update_place(self, address, point):
+        with self._lock:
+            if self._index is None:
+                return
+            restaurant_ids = [
+                restaurant_id
+                for restaurant_id in self._restaurants_by_address.get(address, ())
+                if self._index.get(restaurant_id) != point
+            ]
+            if restaurant_ids and self._bump():
+                for restaurant_id in restaurant_ids:
+                    self._place(restaurant_id, address, *point)
+
+    def is_located(self, restaurant_id):
+        return restaurant_id in self._ensure_built()
+
+    def nearest_k(self, lat, lon, k, predicate=None):
+        return self._ensure_built().nearest_k(lat, lon, k, predicate)
+
+    def reset(self):
+        """Сбрасывает индекс во всех процессах, например после массовых правок."""
+        transaction.on_commit(self._reset)
+
+    def _reset(self):
+        with self._lock:
+            self._version.bump()
+            self._index = None
+
+
+restaurant_index = RestaurantIndex()
@@ -0,0 +1,32 @@
+from django.db import connection
+from django.utils.text import smart_split, unescape_string_literal
+
+
+def normalize_search_text(*parts):
+    """
+    Текст для поиска без учёта регистра: casefold, «ё» как «е»
+    и схлопнутые пробелы. В отличие от LOWER/UPPER в SQLite,
+    правильно работает с кириллицей.
+    """
+    text = ' '.join(part for part in parts if part)
+    return ' '.join(text.casefold().replace('ё', 'е').split())
+
+
+def uses_trigram_search():
+    """
+    PostgreSQL ищет по icontains через триграммные GIN-индексы pg_trgm
+    (см. миграцию 0052), остальные базы — по колонке search_text.
+    """
+    return connection.vendor == 'postgresql'
+
+
+def filter_by_search_text(queryset, search_term):
+    """
+    Оставляет объекты, в `search_text` которых есть каждое слово запроса,
+    как и обычный поиск в админке. Слова в кавычках ищутся целиком.
+    """
+    for bit in smart_split(search_term):
+        if bit.startswith(('"', "'")) and bit[0] == bit[-1]:
+            bit = unescape_string_literal(bit)
+        queryset = queryset.filter(search_text__contains=normalize_search_text(bit))
+    return queryset
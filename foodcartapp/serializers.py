@@ -1,10 +1,39 @@
-from django.db import transaction
+from django.conf import settings
+from django.db import connection, transaction
 from rest_framework import serializers
 
-from .models import Order, ProductQuantity
+from places.utils import geocoding_queue
+from .candidates import refresh_orders_candidates
+from .metrics import ORDERS_REGISTERED
+from .models import Order, Product, ProductQuantity
+
+
+class ProductField(serializers.PrimaryKeyRelatedField):
+    """
+    Товар по id. Если в контексте сериализатора передан словарь `products`
+    ({id: товар}, например из `in_bulk`), товар берётся из него без запроса
+    к БД; ошибки валидации при этом те же, что у PrimaryKeyRelatedField.
+    """
+
+    def to_internal_value(self, data):
+        products = self.context.get('products')
+        if products is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        product = products.get(pk)
+        if product is None:
+            self.fail('does_not_exist', pk_value=data)
+        return product
 
 
 class ProductQuantitySerializer(serializers.ModelSerializer):
+    product = ProductField(queryset=Product.objects.all())
+
     class Meta:
         model = ProductQuantity
         fields = ['product', 'quantity', ]
@@ -16,16 +45,85 @@ class OrderSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Order
-        fields = '__all__'
+        # служебные поля для подбора ресторанов и живой ленты менеджера
+        exclude = ['candidates_stale', 'updated_at']
+
+    def to_internal_value(self, data):
+        # все товары заказа читаются из БД одним запросом, а не по одному
+        # на каждую позицию (см. ProductField)
+        if 'products' not in self.context:
+            self.context['products'] = (
+                Product.objects.only('id', 'price')
+                .in_bulk(collect_product_ids([data]))
+            )
+        return super().to_internal_value(data)
 
     def create(self, validated_data):
-        products = validated_data.pop('products')
-        with transaction.atomic():
-            order = Order.objects.create(**validated_data)
-            products_for_order = [
-                ProductQuantity(**product | {
-                    'order': order, 'price': product['product'].price
-                }) for product in products
-            ]
-            ProductQuantity.objects.bulk_create(products_for_order)
+        [order] = save_orders([validated_data])
         return order
+
+
+def collect_product_ids(orders_data):
+    """id всех товаров из сырых (ещё не провалидированных) данных заказов."""
+    product_ids = set()
+    for order_data in orders_data:
+        if not isinstance(order_data, dict):
+            continue
+        products = order_data.get('products')
+        if not isinstance(products, list):
+            continue
+        for product in products:
+            if not isinstance(product, dict):
+                continue
+            try:
+                product_ids.add(int(product.get('product')))
+            except (TypeError, ValueError):
+                continue
+    return product_ids
+
+
+def save_orders(orders_data):
+    """
+    Сохраняет провалидированные заказы вместе с товарами в одной транзакции.
+
+    Товары всех заказов вставляются одним `bulk_create`. Заказы — тоже одним,
+    если БД умеет возвращать id вставленных строк (PostgreSQL), иначе по одному.
+    """
+    orders_data = [dict(order_data) for order_data in orders_data]
+    products = [order_data.pop('products') for order_data in orders_data]
+    orders = [
+        Order(**order_data, total_price=sum(
+            product['product'].price * product['quantity']
+            for product in order_products
+        ))
+        for order_data, order_products in zip(orders_data, products)
+    ]
+    with transaction.atomic():
+        if connection.features.can_return_rows_from_bulk_insert:
+            Order.objects.bulk_create(orders)
+        else:
+            for order in orders:
+                order.save(force_insert=True)
+        products_for_orders = [
+            ProductQuantity(**product | {
+                'order': order, 'price': product['product'].price
+            })
+            for order, order_products in zip(orders, products)
+            for product in order_products
+        ]
+        ProductQuantity.objects.bulk_create(products_for_orders)
+        transaction.on_commit(lambda: ORDERS_REGISTERED.inc(len(orders)))
+        if settings.GEOCODING_IN_BACKGROUND:
+            addresses = {order.address for order in orders}
+
+            def enqueue_addresses():
+                for address in addresses:
+                    geocoding_queue.enqueue(address)
+
+            transaction.on_commit(enqueue_addresses)
+        else:
+            order_ids = [order.id for order in orders]
+            transaction.on_commit(
+                lambda: refresh_orders_candidates(order_ids)
+            )
+    return orders
@@ -0,0 +1,68 @@
+import time
+
+from django.core.cache import cache
+
+
+class SharedVersion:
+    """
+    Версия данных, которые каждый процесс сервера держит у себя в памяти
+    (индекс ресторанов, матрица доступности), общая для процессов через
+    кеш Django.
+
+    Процесс, поменявший данные, поднимает версию через `bump()`, остальные
+    при следующем `is_stale()` видят, что их копия собрана по старой версии,
+    и пересобирают её. Версия в кеше проверяется не чаще раза в
+    `check_interval` секунд. Кеш по умолчанию (LocMemCache) у каждого
+    процесса свой, поэтому копия вдобавок устаревает через `timeout` секунд
+    после сборки.
+    """
+
+    check_interval = 1
+
+    def __init__(self, key, timeout):
+        self.key = key
+        self.timeout = timeout
+        self._version = None
+        self._built_at = None
+        self._checked_at = None
+
+    def current(self):
+        cache.add(self.key, 0, timeout=None)
+        return cache.get(self.key, 0)
+
+    def mark_built(self, version):
+        """Копия собрана по версии `version`, полученной до начала сборки."""
+        self._version = version
+        self._built_at = self._checked_at = time.monotonic()
+
+    def is_stale(self):
+        if self._built_at is None:
+            return True
+        now = time.monotonic()
+        if now - self._built_at >= self.timeout:
+            return True
+        if now - self._checked_at < self.check_interval:
+            return False
+        self._checked_at = now
+        return self.current() != self._version
+
+    def bump(self):
+        """
+        Поднимает версию после изменения данных в этом процессе.
+
+        Возвращает True, если копия процесса была актуальной и её достаточно
+        поправить на месте. Иначе копия считается устаревшей и должна быть
+        пересобрана.
+        """
+        cache.add(self.key, 0, timeout=None)
+        try:
+            version = cache.incr(self.key)
+        except ValueError:
+            # ключ успели вытеснить из кеша
+            version = None
+        if (self._version is not None and version is not None
+                and version == self._version + 1):
+            self._version = version
+            return True
+        self._version = self._built_at = None
+        return False
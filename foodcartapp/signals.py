@@ -0,0 +1,165 @@
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from places.address import normalize_address
+from places.models import Place
+from places.utils import geocoding_queue
+from .availability import availability_matrix
+from .banners import invalidate_banners
+from .candidates import refresh_candidates_after_geocoding
+from .catalogue import invalidate_catalogue
+from .models import (Banner, Order, Product, ProductCategory, Restaurant,
+                     RestaurantMenuItem)
+from .restaurant_index import restaurant_index
+
+
+@receiver(pre_save, sender=Product)
+@receiver(pre_save, sender=Restaurant)
+def update_search_text(sender, instance, **kwargs):
+    instance.search_text = instance.build_search_text()
+
+
+@receiver(post_save, sender=ProductCategory)
+def update_category_products_search_text(sender, instance, created, **kwargs):
+    if created:
+        return
+    products = list(instance.products.only('id', 'name', 'category'))
+    for product in products:
+        product.category = instance
+        product.search_text = product.build_search_text()
+    Product.objects.bulk_update(products, ['search_text'], batch_size=1000)
+
+
+def address_changed(restaurant, created):
+    """Поменялся ли адрес ресторана при сохранении (см. remember_saved_address)."""
+    if created:
+        return True
+    saved_address = getattr(restaurant, '_saved_address', None)
+    return (saved_address is None
+            or normalize_address(saved_address)
+            != normalize_address(restaurant.address))
+
+
+@receiver(post_save, sender=Restaurant)
+def update_restaurant_location(sender, instance, created, **kwargs):
+    # правка названия или телефона индекс не меняет
+    if address_changed(instance, created):
+        restaurant_index.update_restaurant(instance)
+
+
+@receiver(post_delete, sender=Restaurant)
+def remove_restaurant_location(sender, instance, **kwargs):
+    restaurant_index.remove_restaurant(instance.id)
+
+
+@receiver(post_save, sender=Place)
+def update_restaurants_at_place(sender, instance, **kwargs):
+    restaurant_index.update_place(instance)
+
+
+@receiver(post_save, sender=RestaurantMenuItem)
+def update_menu_item_availability(sender, instance, **kwargs):
+    availability_matrix.update_item(instance)
+
+
+@receiver(post_delete, sender=RestaurantMenuItem)
+def remove_menu_item_availability(sender, instance, **kwargs):
+    availability_matrix.remove_item(instance.id)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductCategory)
+@receiver(post_delete, sender=ProductCategory)
+@receiver(post_save, sender=RestaurantMenuItem)
+@receiver(post_delete, sender=RestaurantMenuItem)
+def reset_catalogue(sender, **kwargs):
+    invalidate_catalogue()
+
+
+@receiver(post_save, sender=Banner)
+@receiver(post_delete, sender=Banner)
+def reset_banners(sender, **kwargs):
+    invalidate_banners()
+
+
+def reset_candidates_for_menu_change(product_id, restaurant_id, available):
+    """
+    Помечает устаревшими рестораны у заказов, на которые влияет то, что
+    продукт появился в продаже в ресторане или пропал из неё.
+    """
+    orders = Order.objects.filter(status=Order.OrderStatus.NOT_PROCESSED,
+                                  products=product_id)
+    if not available:
+        # заказы, где ресторан не был подобран, от этого не меняются
+        orders = orders.filter(restaurant_candidates__restaurant=restaurant_id)
+    orders.mark_candidates_stale()
+
+
+def menu_item_offers(product_id, restaurant_id, availability):
+    return {(product_id, restaurant_id)} if availability else set()
+
+
+@receiver(pre_save, sender=RestaurantMenuItem)
+def remember_saved_menu_item(sender, instance, **kwargs):
+    saved = None
+    if instance.pk is not None:
+        saved = (
+            RestaurantMenuItem.objects.filter(pk=instance.pk)
+            .values_list('product_id', 'restaurant_id', 'availability')
+            .first()
+        )
+    instance._saved_offers = menu_item_offers(*saved) if saved else set()
+
+
+@receiver(post_save, sender=RestaurantMenuItem)
+def reset_candidates_after_menu_item_save(sender, instance, **kwargs):
+    offers = menu_item_offers(instance.product_id, instance.restaurant_id,
+                              instance.availability)
+    saved_offers = getattr(instance, '_saved_offers', set())
+    for product_id, restaurant_id in saved_offers - offers:
+        reset_candidates_for_menu_change(product_id, restaurant_id, False)
+    for product_id, restaurant_id in offers - saved_offers:
+        reset_candidates_for_menu_change(product_id, restaurant_id, True)
+
+
+@receiver(post_delete, sender=RestaurantMenuItem)
+def reset_candidates_after_menu_item_delete(sender, instance, **kwargs):
+    if instance.availability:
+        reset_candidates_for_menu_change(instance.product_id,
+                                         instance.restaurant_id, False)
+
+
+@receiver(pre_save, sender=Restaurant)
+def remember_saved_address(sender, instance, **kwargs):
+    instance._saved_address = None
+    if instance.pk is not None:
+        instance._saved_address = (
+            Restaurant.objects.filter(pk=instance.pk)
+            .values_list('address', flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Restaurant)
+def reset_candidates_after_move(sender, instance, created, **kwargs):
+    # у нового ресторана ещё нет меню, заказы поменяются вместе с ним,
+    # а правка названия или телефона расстояний до заказов не меняет
+    if created or not address_changed(instance, created):
+        return
+    (Order.objects
+        .filter(status=Order.OrderStatus.NOT_PROCESSED)
+        .mark_candidates_stale())
+
+
+@receiver(pre_delete, sender=Restaurant)
+def reset_candidates_with_restaurant(sender, instance, **kwargs):
+    # до удаления, пока подобранные рестораны заказов ещё в БД
+    (Order.objects
+        .filter(status=Order.OrderStatus.NOT_PROCESSED,
+                restaurant_candidates__restaurant=instance.id)
+        .mark_candidates_stale())
+
+
+geocoding_queue.add_listener(refresh_candidates_after_geocoding)
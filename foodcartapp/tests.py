@@ -0,0 +1,453 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework import serializers, status
+
+from places.models import Place
+from places.utils import geocode_cache
+
+from .availability import AvailabilityMatrix
+from .candidates import (refresh_candidates,
+                         refresh_candidates_after_geocoding)
+from .models import (Order, Product, ProductQuantity, Restaurant,
+                     RestaurantMenuItem)
+from .restaurant_index import RestaurantIndex
+from .serializers import OrderSerializer
+
+
+class RestaurantIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        geocode_cache.clear()
+        Place.objects.create(address='Москва, Тверская, 1',
+                             longitude=37.61, latitude=55.76)
+        Place.objects.create(address='Москва, Арбат, 1',
+                             longitude=37.59, latitude=55.75)
+        self.restaurant = Restaurant.objects.create(
+            name='Star Burger', address='Москва, Тверская, 1',
+        )
+
+    def nearest_ids(self, index):
+        return [restaurant_id
+                for restaurant_id, _ in index.nearest_k(55.76, 37.61, 5)]
+
+    def test_change_in_one_process_rebuilds_another(self):
+        writer, reader = RestaurantIndex(), RestaurantIndex()
+        self.assertEqual(self.nearest_ids(writer), [self.restaurant.id])
+        self.assertEqual(self.nearest_ids(reader), [self.restaurant.id])
+
+        version = writer._version.current()
+        with self.captureOnCommitCallbacks(execute=True):
+            other = Restaurant.objects.create(name='Star Burger Арбат',
+                                              address='Москва, Арбат, 1')
+            writer.update_restaurant(other)
+            # до коммита другие процессы ничего не узнают
+            self.assertEqual(writer._version.current(), version)
+        reader._version._checked_at -= reader._version.check_interval
+
+        self.assertEqual(self.nearest_ids(reader),
+                         [self.restaurant.id, other.id])
+
+    def test_local_change_keeps_index(self):
+        index = RestaurantIndex()
+        self.nearest_ids(index)
+        spatial_index = index._index
+
+        with self.captureOnCommitCallbacks(execute=True):
+            index.remove_restaurant(self.restaurant.id)
+
+        self.assertIs(index._index, spatial_index)
+        self.assertEqual(self.nearest_ids(index), [])
+
+    def test_rolled_back_change_ignored(self):
+        index = RestaurantIndex()
+        self.nearest_ids(index)
+        version = index._version.current()
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            index.remove_restaurant(self.restaurant.id)
+        # колбэки не выполнены, как при откате транзакции
+
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(index._version.current(), version)
+        self.assertEqual(self.nearest_ids(index), [self.restaurant.id])
+
+    def test_phone_change_keeps_version(self):
+        version = RestaurantIndex()._version.current()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.restaurant.contact_phone = '+74951234567'
+            self.restaurant.save()
+        self.assertEqual(RestaurantIndex()._version.current(), version)
+
+    def test_moved_place(self):
+        index = RestaurantIndex()
+        self.nearest_ids(index)
+        place = Place.objects.get(address='Москва, Тверская, 1')
+        place.longitude, place.latitude = 30.31, 59.94
+
+        with self.captureOnCommitCallbacks(execute=True):
+            index.update_place(place)
+            index.update_place(Place(address='Москва, Нигде, 1',
+                                     normalized_address='москва нигде 1'))
+
+        self.assertEqual(index._index.get(self.restaurant.id), (30.31, 59.94))
+        self.assertNotIn('москва нигде 1', index._restaurants_by_address)
+
+    def test_rebuilt_after_timeout(self):
+        index = RestaurantIndex()
+        self.nearest_ids(index)
+        Place.objects.create(address='Москва, Неизвестная, 1')
+        Restaurant.objects.filter(pk=self.restaurant.pk).update(
+            address='Москва, Неизвестная, 1',
+        )
+        index._version._built_at -= index._version.timeout
+
+        self.assertEqual(self.nearest_ids(index), [])
+
+
+class AvailabilityMatrixTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.restaurant = Restaurant.objects.create(name='Star Burger')
+        self.other_restaurant = Restaurant.objects.create(name='Star Burger 2')
+        self.product = Product.objects.create(name='Чизбургер', price=100)
+        self.other_product = Product.objects.create(name='Фри', price=50)
+        self.item = RestaurantMenuItem.objects.create(
+            restaurant=self.restaurant, product=self.product,
+        )
+        RestaurantMenuItem.objects.create(
+            restaurant=self.other_restaurant, product=self.other_product,
+        )
+        RestaurantMenuItem.objects.create(
+            restaurant=self.restaurant, product=self.other_product,
+            availability=False,
+        )
+
+    def rows(self, matrix):
+        return matrix.availability_rows(
+            [self.product.id, self.other_product.id],
+            [self.restaurant.id, self.other_restaurant.id],
+        )
+
+    def test_rows(self):
+        self.assertEqual(self.rows(AvailabilityMatrix()),
+                         [[True, False], [False, True]])
+
+    def test_change_in_one_process_rebuilds_another(self):
+        writer, reader = AvailabilityMatrix(), AvailabilityMatrix()
+        self.rows(writer)
+        self.rows(reader)
+        masks = writer._product_masks
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.availability = False
+            self.item.save()
+            writer.update_item(self.item)
+        reader._version._checked_at -= reader._version.check_interval
+
+        expected = [[False, False], [False, True]]
+        self.assertEqual(self.rows(writer), expected)
+        self.assertIs(writer._product_masks, masks)
+        self.assertEqual(self.rows(reader), expected)
+
+    def test_rolled_back_change_ignored(self):
+        matrix = AvailabilityMatrix()
+        self.rows(matrix)
+        version = matrix._version.current()
+
+        # колбэки не выполнены, как при откате транзакции
+        with self.captureOnCommitCallbacks():
+            matrix.remove_item(self.item.id)
+
+        self.assertEqual(matrix._version.current(), version)
+        self.assertEqual(self.rows(matrix), [[True, False], [False, True]])
+
+    def test_reset_after_bulk_update(self):
+        writer, reader = AvailabilityMatrix(), AvailabilityMatrix()
+        self.rows(reader)
+
+        RestaurantMenuItem.objects.update(availability=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            writer.reset()
+        reader._version._checked_at -= reader._version.check_interval
+
+        self.assertEqual(self.rows(reader), [[False, False], [False, False]])
+
+
+class CandidatesInvalidationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        geocode_cache.clear()
+        Place.objects.create(address='Москва, Тверская, 1',
+                             longitude=37.61, latitude=55.76)
+        Place.objects.create(address='Москва, Арбат, 1',
+                             longitude=37.59, latitude=55.75)
+        self.restaurant = Restaurant.objects.create(
+            name='Star Burger', address='Москва, Тверская, 1',
+        )
+        self.product = Product.objects.create(name='Чизбургер', price=100)
+        self.item = RestaurantMenuItem.objects.create(
+            restaurant=self.restaurant, product=self.product,
+        )
+        self.order = Order.objects.create(
+            firstname='Иван', lastname='Иванов',
+            phonenumber='+79161234567', address='Москва, Арбат, 1',
+        )
+        ProductQuantity.objects.create(order=self.order, product=self.product,
+                                       quantity=1, price=100)
+        refresh_candidates(list(Order.objects.with_products()))
+
+    def assertStale(self, stale):
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.candidates_stale, stale)
+
+    def test_refresh_keeps_updated_at(self):
+        self.order.mark_candidates_stale()
+        self.order.refresh_from_db()
+        updated_at = self.order.updated_at
+
+        refresh_candidates(list(Order.objects.with_products()))
+
+        self.order.refresh_from_db()
+        self.assertFalse(self.order.candidates_stale)
+        self.assertEqual(self.order.updated_at, updated_at)
+        self.assertTrue(self.order.restaurant_candidates.exists())
+
+    def test_restaurant_phone_change(self):
+        self.restaurant.contact_phone = '+74951234567'
+        self.restaurant.save()
+        self.assertStale(False)
+
+    def test_restaurant_address_change(self):
+        self.restaurant.address = 'Москва, Арбат, 1'
+        self.restaurant.save()
+        self.assertStale(True)
+
+    def test_restaurant_delete(self):
+        self.restaurant.delete()
+        self.assertStale(True)
+
+    def test_menu_item_saved_unchanged(self):
+        self.item.save()
+        self.assertStale(False)
+
+    def test_menu_item_availability_change(self):
+        self.item.availability = False
+        self.item.save()
+        self.assertStale(True)
+
+    def test_new_menu_item(self):
+        other = Restaurant.objects.create(name='Star Burger Арбат',
+                                          address='Москва, Арбат, 1')
+        self.assertStale(False)
+        RestaurantMenuItem.objects.create(restaurant=other,
+                                          product=self.product)
+        self.assertStale(True)
+
+    def test_api_hides_internal_fields(self):
+        data = OrderSerializer(self.order).data
+        self.assertNotIn('candidates_stale', data)
+        self.assertNotIn('updated_at', data)
+
+
+@override_settings(MANAGER_ORDERS_PAGE_SIZE=2)
+class CandidatesRefreshTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        geocode_cache.clear()
+        Place.objects.create(address='Москва, Тверская, 1',
+                             longitude=37.61, latitude=55.76)
+        Place.objects.create(address='Москва, Арбат, 1',
+                             longitude=37.59, latitude=55.75)
+        restaurant = Restaurant.objects.create(name='Star Burger',
+                                               address='Москва, Тверская, 1')
+        self.product = Product.objects.create(name='Чизбургер', price=100)
+        RestaurantMenuItem.objects.create(restaurant=restaurant,
+                                          product=self.product)
+
+    def create_order(self, address):
+        order = Order.objects.create(
+            firstname='Иван', lastname='Иванов',
+            phonenumber='+79161234567', address=address,
+        )
+        ProductQuantity.objects.create(order=order, product=self.product,
+                                       quantity=1, price=100)
+        return order
+
+    def stale_ids(self):
+        return set(Order.objects.filter(candidates_stale=True)
+                   .values_list('id', flat=True))
+
+    def test_after_geocoding_only_orders_with_these_addresses(self):
+        # старые заказы с другим адресом не должны занимать место новых
+        others = [self.create_order('Москва, Тверская, 1') for _ in range(4)]
+        orders = [self.create_order('Москва, Арбат, 1'),
+                  self.create_order('москва арбат 1')]
+        processed = self.create_order('Москва, Арбат, 1')
+        Order.objects.filter(pk=processed.pk).update(
+            status=Order.OrderStatus.PROCESSED,
+        )
+
+        refresh_candidates_after_geocoding(['Москва, Арбат, 1'])
+
+        self.assertEqual(self.stale_ids(),
+                         {order.id for order in others} | {processed.id})
+        for order in orders:
+            self.assertTrue(order.restaurant_candidates.exists())
+
+    def test_repeated_refresh_is_skipped(self):
+        order = self.create_order('Москва, Арбат, 1')
+        orders = list(Order.objects.with_products())
+        refresh_candidates(list(Order.objects.with_products()))
+        candidate_ids = set(
+            order.restaurant_candidates.values_list('id', flat=True)
+        )
+
+        # вторая выборка была сделана до первого обновления
+        refresh_candidates(orders)
+
+        self.assertEqual(
+            set(order.restaurant_candidates.values_list('id', flat=True)),
+            candidate_ids,
+        )
+
+    @override_settings(GEOCODING_IN_BACKGROUND=False)
+    def test_registration_without_background_geocoding(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/order/', {
+                'firstname': 'Иван',
+                'lastname': 'Иванов',
+                'phonenumber': '+79161234567',
+                'address': 'Москва, Арбат, 1',
+                'products': [{'product': self.product.id, 'quantity': 1}],
+            }, content_type='application/json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.stale_ids(), set())
+        self.assertTrue(Order.objects.get().restaurant_candidates.exists())
+
+
+class OrderValidationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = [
+            Product.objects.create(name=f'Продукт {number}', price=100)
+            for number in range(20)
+        ]
+
+    def order_data(self, product_ids):
+        return {
+            'firstname': 'Иван',
+            'lastname': 'Иванов',
+            'phonenumber': '+79161234567',
+            'address': 'Москва, Арбат, 1',
+            'products': [
+                {'product': product_id, 'quantity': 1}
+                for product_id in product_ids
+            ],
+        }
+
+    def test_one_query_for_any_number_of_lines(self):
+        for count in [1, len(self.products)]:
+            serializer = OrderSerializer(data=self.order_data(
+                [product.id for product in self.products[:count]]
+            ))
+            with self.assertNumQueries(1):
+                self.assertTrue(serializer.is_valid(), serializer.errors)
+            self.assertEqual(len(serializer.validated_data['products']),
+                             count)
+
+    def test_errors_match_primary_key_field(self):
+        field = serializers.PrimaryKeyRelatedField(
+            queryset=Product.objects.all()
+        )
+        missing_id = max(product.id for product in self.products) + 1
+        for value in [missing_id, str(missing_id), 'бургер', True, [1]]:
+            with self.subTest(value=value):
+                serializer = OrderSerializer(data=self.order_data(
+                    [self.products[0].id, value]
+                ))
+                self.assertFalse(serializer.is_valid())
+                with self.assertRaises(serializers.ValidationError) as error:
+                    field.run_validation(value)
+                self.assertEqual(serializer.errors['products'][1]['product'],
+                                 error.exception.detail)
+
+    def test_string_id(self):
+        serializer = OrderSerializer(data=self.order_data(
+            [str(self.products[0].id)]
+        ))
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertEqual(serializer.validated_data['products'][0]['product'],
+                         self.products[0])
+
+
+class OrdersBatchApiTests(TestCase):
+    url = '/api/orders/batch/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.burger = Product.objects.create(name='Чизбургер', price=100)
+        cls.fries = Product.objects.create(name='Картофель фри', price=50)
+
+    def order_data(self, **fields):
+        return {
+            'firstname': 'Иван',
+            'lastname': 'Иванов',
+            'phonenumber': '+79161234567',
+            'address': 'Москва, Арбат, 1',
+            'products': [
+                {'product': self.burger.id, 'quantity': 2},
+                {'product': self.fries.id, 'quantity': 1},
+            ],
+        } | fields
+
+    def post(self, data):
+        return self.client.post(self.url, data,
+                                content_type='application/json')
+
+    def test_all_created(self):
+        response = self.post([self.order_data(), self.order_data()])
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        results = response.json()['results']
+        self.assertEqual([result['status'] for result in results],
+                         ['created', 'created'])
+        order = Order.objects.get(pk=results[0]['order']['id'])
+        self.assertEqual(order.total_price, 250)
+        self.assertEqual(order.productquantity_set.count(), 2)
+
+    def test_partial_failure(self):
+        response = self.post([
+            self.order_data(products=[]),
+            self.order_data(),
+            self.order_data(phonenumber='не телефон'),
+        ])
+
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        results = response.json()['results']
+        self.assertEqual([(result['index'], result['status'])
+                          for result in results],
+                         [(0, 'error'), (1, 'created'), (2, 'error')])
+        self.assertIn('products', results[0]['errors'])
+        self.assertIn('phonenumber', results[2]['errors'])
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_all_failed(self):
+        response = self.post([
+            self.order_data(products=[{'product': 0, 'quantity': 1}]),
+        ])
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        [result] = response.json()['results']
+        self.assertEqual(result['status'], 'error')
+        self.assertFalse(Order.objects.exists())
+
+    def test_not_a_list(self):
+        response = self.post(self.order_data())
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(ORDERS_BATCH_MAX_SIZE=1)
+    def test_too_many_orders(self):
+        response = self.post([self.order_data(), self.order_data()])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Order.objects.exists())
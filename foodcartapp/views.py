@@ -2,63 +2,24 @@ from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
-from django.http import JsonResponse
-from django.templatetags.static import static
+from django.conf import settings
+from django.http import StreamingHttpResponse
 
+from .banners import get_banners
+from .catalogue import get_catalogue, stream_catalogue
 from .models import Product
-from .serializers import OrderSerializer
+from .serializers import OrderSerializer, collect_product_ids, save_orders
 
 
 def banners_list_api(request):
-    # FIXME move data to db?
-    return JsonResponse([
-        {
-            'title': 'Burger',
-            'src': static('burger.jpg'),
-            'text': 'Tasty Burger at your door step',
-        },
-        {
-            'title': 'Spices',
-            'src': static('food.jpg'),
-            'text': 'All Cuisines',
-        },
-        {
-            'title': 'New York',
-            'src': static('tasty.jpg'),
-            'text': 'Food is incomplete without a tasty dessert',
-        }
-    ], safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
-    })
+    return get_banners().to_response(request)
 
 
 def product_list_api(request):
-    products = Product.objects.select_related('category').available()
-
-    dumped_products = []
-    for product in products:
-        dumped_product = {
-            'id': product.id,
-            'name': product.name,
-            'price': product.price,
-            'special_status': product.special_status,
-            'description': product.description,
-            'category': {
-                'id': product.category.id,
-                'name': product.category.name,
-            },
-            'image': product.image.url,
-            'restaurant': {
-                'id': product.id,
-                'name': product.name,
-            }
-        }
-        dumped_products.append(dumped_product)
-    return JsonResponse(dumped_products, safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
-    })
+    if settings.CATALOGUE_STREAMING:
+        return StreamingHttpResponse(stream_catalogue(),
+                                     content_type='application/json')
+    return get_catalogue().to_response(request)
 
 
 @api_view(['POST'])
@@ -73,3 +34,64 @@ def register_order(request):
             {"server_error": f"Can not save order with products - {exc}"},
             status.HTTP_500_INTERNAL_SERVER_ERROR
         )
+
+
+@api_view(['POST'])
+def register_orders_batch(request):
+    """
+    Принимает список заказов. Цены всех упомянутых товаров читаются одним
+    запросом, корректные заказы сохраняются пачкой, а для каждого заказа
+    в ответе — свой результат: созданный заказ или ошибки валидации.
+    """
+    if not isinstance(request.data, list):
+        return Response(
+            {"non_field_errors": ["Ожидается список заказов"]},
+            status.HTTP_400_BAD_REQUEST
+        )
+    if len(request.data) > settings.ORDERS_BATCH_MAX_SIZE:
+        return Response(
+            {"non_field_errors": [
+                f"Не больше {settings.ORDERS_BATCH_MAX_SIZE} заказов за раз"
+            ]},
+            status.HTTP_400_BAD_REQUEST
+        )
+
+    products = Product.objects.only('id', 'price').in_bulk(
+        collect_product_ids(request.data)
+    )
+    results = []
+    valid_serializers = []
+    for index, order_data in enumerate(request.data):
+        serializer = OrderSerializer(data=order_data,
+                                     context={'products': products})
+        if serializer.is_valid():
+            valid_serializers.append((index, serializer))
+        else:
+            results.append(
+                {"index": index, "status": "error",
+                 "errors": serializer.errors}
+            )
+
+    try:
+        orders = save_orders(
+            serializer.validated_data for _, serializer in valid_serializers
+        )
+    except Exception as exc:
+        return Response(
+            {"server_error": f"Can not save orders with products - {exc}"},
+            status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    for (index, serializer), order in zip(valid_serializers, orders):
+        serializer.instance = order
+        results.append(
+            {"index": index, "status": "created", "order": serializer.data}
+        )
+    results.sort(key=lambda result: result["index"])
+
+    if not orders:
+        response_status = status.HTTP_400_BAD_REQUEST
+    elif len(orders) < len(results):
+        response_status = status.HTTP_207_MULTI_STATUS
+    else:
+        response_status = status.HTTP_201_CREATED
+    return Response({"results": results}, response_status)
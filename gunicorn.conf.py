@@ -0,0 +1,18 @@
+import os
+
+from prometheus_client import multiprocess
+
+
+# Страница заказов менеджера держит открытым поток server-sent events
+# до ORDERS_STREAM_MAX_AGE секунд. Синхронный воркер занят им целиком
+# и через `timeout` секунд будет убит мастером, а у gthread-воркера
+# таймаут следит только за живостью самого процесса, и поток занимает
+# лишь один из его `threads` потоков.
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+
+def child_exit(server, worker):
+    # метрики завершившегося воркера больше не нужно собирать из его файлов
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,41 @@
+import re
+
+
+# сокращения из адресов и их полные формы
+ABBREVIATIONS = {
+    'г': 'город',
+    'обл': 'область',
+    'р-н': 'район',
+    'мкр': 'микрорайон',
+    'мкрн': 'микрорайон',
+    'ул': 'улица',
+    'пр-т': 'проспект',
+    'пр-кт': 'проспект',
+    'просп': 'проспект',
+    'пер': 'переулок',
+    'б-р': 'бульвар',
+    'бул': 'бульвар',
+    'ш': 'шоссе',
+    'пл': 'площадь',
+    'наб': 'набережная',
+    'туп': 'тупик',
+    'д': 'дом',
+    'вл': 'владение',
+    'к': 'корпус',
+    'корп': 'корпус',
+    'стр': 'строение',
+    'кв': 'квартира',
+}
+
+# слово, в том числе через дефис или дробь: «пр-т», «санкт-петербург», «15/2»
+TOKEN_RE = re.compile(r'\w+(?:[-/]\w+)*')
+
+
+def normalize_address(address):
+    """
+    Ключ адреса для поиска координат: регистр, «ё», пробелы и знаки
+    препинания не важны, сокращения раскрыты. Так «Москва, ул. Новый Арбат,
+    15» и «москва улица новый арбат 15» — один и тот же адрес.
+    """
+    tokens = TOKEN_RE.findall(address.casefold().replace('ё', 'е'))
+    return ' '.join(ABBREVIATIONS.get(token, token) for token in tokens)
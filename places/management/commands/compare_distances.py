@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from places.models import Place
+from places.utils.distance_matrix import compare_with_geodesic
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает расстояния по формуле гаверсинусов с точным расчётом '
+        'geopy для всех пар мест с известными координатами'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=300,
+                            help='сколько мест брать из таблицы Place')
+
+    def handle(self, *args, **options):
+        coordinates = list(
+            Place.objects
+            .filter(longitude__isnull=False, latitude__isnull=False)
+            .values_list('longitude', 'latitude')[:options['limit']]
+        )
+        report = compare_with_geodesic(coordinates, coordinates)
+        if report is None:
+            self.stdout.write('Недостаточно мест с известными координатами')
+            return
+        self.stdout.write(
+            f'Пар точек: {report["pairs"]}\n'
+            f'Ошибка, км: макс. {report["max_error_km"]:.4f}, '
+            f'сред. {report["mean_error_km"]:.4f}\n'
+            f'Ошибка, %: макс. {report["max_error_percent"]:.3f}, '
+            f'сред. {report["mean_error_percent"]:.3f}\n'
+            f'Время, с: гаверсинусы {report["haversine_seconds"]:.4f}, '
+            f'geopy {report["geodesic_seconds"]:.4f}'
+        )
@@ -0,0 +1,17 @@
+from prometheus_client import Counter, Histogram
+
+
+GEOCODER_REQUEST_SECONDS = Histogram(
+    'starburger_geocoder_request_seconds',
+    'Время запроса к геокодеру, включая повторы',
+)
+GEOCODER_FAILURES = Counter(
+    'starburger_geocoder_failures_total',
+    'Запросы к геокодеру, завершившиеся ошибкой',
+)
+GEOCODE_LOOKUPS = Counter(
+    'starburger_geocode_lookups_total',
+    'Поиск координат адреса по источнику: memory и db — попадания в кеш, '
+    'geocoder — промах, адрес пришлось геокодировать',
+    ['source'],
+)
@@ -0,0 +1,88 @@
+import re
+
+from django.db import migrations, models
+
+
+# копия places.address на момент миграции: миграция должна давать
+# те же ключи, даже если нормализация в коде приложения потом поменяется
+ABBREVIATIONS = {
+    'г': 'город',
+    'обл': 'область',
+    'р-н': 'район',
+    'мкр': 'микрорайон',
+    'мкрн': 'микрорайон',
+    'ул': 'улица',
+    'пр-т': 'проспект',
+    'пр-кт': 'проспект',
+    'просп': 'проспект',
+    'пер': 'переулок',
+    'б-р': 'бульвар',
+    'бул': 'бульвар',
+    'ш': 'шоссе',
+    'пл': 'площадь',
+    'наб': 'набережная',
+    'туп': 'тупик',
+    'д': 'дом',
+    'вл': 'владение',
+    'к': 'корпус',
+    'корп': 'корпус',
+    'стр': 'строение',
+    'кв': 'квартира',
+}
+
+# слово, в том числе через дефис или дробь: «пр-т», «санкт-петербург», «15/2»
+TOKEN_RE = re.compile(r'\w+(?:[-/]\w+)*')
+
+
+def normalize_address(address):
+    tokens = TOKEN_RE.findall(address.casefold().replace('ё', 'е'))
+    return ' '.join(ABBREVIATIONS.get(token, token) for token in tokens)
+
+
+def merge_duplicate_places(apps, schema_editor):
+    """
+    Проставляет нормализованные адреса и оставляет по одной записи на адрес:
+    с известными координатами, из них — самую свежую.
+    """
+    Place = apps.get_model('places', 'Place')
+    best_places = {}
+    duplicates = []
+    for place in Place.objects.order_by('id'):
+        place.normalized_address = normalize_address(place.address)
+        best = best_places.get(place.normalized_address)
+        if best is None:
+            best_places[place.normalized_address] = place
+            continue
+        rank = (place.latitude is not None, place.request_date)
+        best_rank = (best.latitude is not None, best.request_date)
+        if rank > best_rank:
+            best_places[place.normalized_address] = place
+            duplicates.append(best.id)
+        else:
+            duplicates.append(place.id)
+    for start in range(0, len(duplicates), 500):
+        Place.objects.filter(id__in=duplicates[start:start + 500]).delete()
+    Place.objects.bulk_update(best_places.values(), ['normalized_address'],
+                              batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('places', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='place',
+            name='normalized_address',
+            field=models.CharField(default='', editable=False, max_length=400, verbose_name='нормализованный адрес'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(merge_duplicate_places, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='place',
+            name='normalized_address',
+            field=models.CharField(editable=False, help_text='по нему ищутся координаты, см. places.address', max_length=400, unique=True, verbose_name='нормализованный адрес'),
+        ),
+    ]
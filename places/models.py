@@ -7,6 +7,13 @@ class Place(models.Model):
     address = models.CharField(verbose_name='адрес',
                                max_length=200,
                                unique=True)
+    normalized_address = models.CharField(
+        verbose_name='нормализованный адрес',
+        max_length=400,
+        unique=True,
+        editable=False,
+        help_text='по нему ищутся координаты, см. places.address',
+    )
     request_date = models.DateField(verbose_name='дата запроса к геокодеру',
                                     auto_now_add=True)
 
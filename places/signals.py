@@ -0,0 +1,21 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .address import normalize_address
+from .models import Place
+from .utils import geocode_cache
+
+
+@receiver(pre_save, sender=Place)
+def update_normalized_address(sender, instance, **kwargs):
+    instance.normalized_address = normalize_address(instance.address)
+
+
+@receiver(post_save, sender=Place)
+def update_cached_coordinates(sender, instance, **kwargs):
+    geocode_cache.update(instance)
+
+
+@receiver(post_delete, sender=Place)
+def forget_cached_coordinates(sender, instance, **kwargs):
+    geocode_cache.forget(instance.address)
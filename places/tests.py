@@ -1,3 +1,213 @@
-from django.test import TestCase
+import json
+import random
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from places.address import normalize_address
+from places.models import Place
+from places.utils import geocoder
+from places.utils.cache import GeocodeCache
+from places.utils.distance_matrix import haversine_matrix
+from places.utils.geocoder import fetch_coordinates, fetch_coordinates_batch
+from places.utils.spatial_index import SpatialIndex
+
+
+class SpatialIndexTests(SimpleTestCase):
+    def setUp(self):
+        rnd = random.Random(0)
+        self.index = SpatialIndex()
+        self.points = {}
+        for key in range(200):
+            lon, lat = rnd.uniform(37.37, 37.84), rnd.uniform(55.57, 55.91)
+            self.points[key] = (lon, lat)
+            self.index.add(key, lon, lat)
+
+    def brute_force(self, lat, lon, k, predicate=None):
+        keys = [key for key in self.points
+                if predicate is None or predicate(key)]
+        distances = haversine_matrix(
+            [(lon, lat)], [self.points[key] for key in keys]
+        )[0]
+        return sorted(zip(keys, distances.tolist()),
+                      key=lambda pair: pair[1])[:k]
+
+    def assertSameNearest(self, lat, lon, k, predicate=None):
+        found = self.index.nearest_k(lat, lon, k, predicate)
+        expected = self.brute_force(lat, lon, k, predicate)
+        self.assertEqual([key for key, _ in found],
+                         [key for key, _ in expected])
+        for (_, distance), (_, expected_distance) in zip(found, expected):
+            self.assertAlmostEqual(distance, expected_distance)
+
+    def test_matches_brute_force(self):
+        self.assertSameNearest(55.75, 37.62, 5)
+        self.assertSameNearest(55.75, 37.62, 5, lambda key: key % 7 == 0)
+        self.assertSameNearest(59.94, 30.31, 3)
+
+    def test_far_point_when_too_few_match(self):
+        self.points['far'] = (131.9, 43.1)
+        self.index.add('far', 131.9, 43.1)
+
+        def predicate(key):
+            return key == 'far' or key in (1, 2)
+
+        started_at = time.perf_counter()
+        self.assertSameNearest(55.75, 37.62, 5, predicate)
+        self.assertLess(time.perf_counter() - started_at, 0.5)
+
+    def test_move_and_remove(self):
+        self.index.add(0, 30.31, 59.94)
+        self.points[0] = (30.31, 59.94)
+        self.index.remove(1)
+        del self.points[1]
+        self.assertNotIn(1, self.index)
+        self.assertSameNearest(59.9, 30.3, 3)
+
+
+class NormalizeAddressTests(SimpleTestCase):
+    def test_same_address_written_differently(self):
+        addresses = [
+            'Москва, ул. Новый Арбат, д. 15',
+            'москва улица новый арбат дом 15',
+            '  МОСКВА,ул.Новый  Арбат,   д.15 ',
+        ]
+        self.assertEqual(
+            {normalize_address(address) for address in addresses},
+            {'москва улица новый арбат дом 15'},
+        )
+
+    def test_yo_and_hyphenated_words(self):
+        self.assertEqual(
+            normalize_address('Санкт-Петербург, Лётчиков пр-т, 15/2'),
+            'санкт-петербург летчиков проспект 15/2',
+        )
+
+    def test_abbreviations_only_as_whole_words(self):
+        self.assertEqual(normalize_address('г. Москва, Кутузовский просп.'),
+                         'город москва кутузовский проспект')
+        self.assertEqual(normalize_address('Дубки, д 1 к 2'),
+                         'дубки дом 1 корпус 2')
+
+    def test_different_addresses(self):
+        self.assertNotEqual(normalize_address('Москва, Тверская, 1'),
+                            normalize_address('Москва, Тверская, 11'))
+
+    def test_empty(self):
+        self.assertEqual(normalize_address(''), '')
+        self.assertEqual(normalize_address(' , . '), '')
+
+
+# ответы заглушки геокодера: координаты «долгота широта» или None, если
+# адрес не найден; на остальные адреса заглушка отвечает ошибкой 500
+STUB_GEOCODER_ADDRESSES = {
+    'Москва, Тверская, 1': '37.61 55.76',
+    'Москва, Арбат, 1': '37.59 55.75',
+    'Москва, Мясницкая, 1': '37.63 55.76',
+    'Нигде': None,
+}
+
+
+class StubGeocoderHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        address = parse_qs(urlparse(self.path).query)['geocode'][0]
+        self.server.requested.append(address)
+        if address not in STUB_GEOCODER_ADDRESSES:
+            self.send_response(500)
+            self.end_headers()
+            return
+        pos = STUB_GEOCODER_ADDRESSES[address]
+        found = [{'GeoObject': {'Point': {'pos': pos}}}] if pos else []
+        body = json.dumps({
+            'response': {'GeoObjectCollection': {'featureMember': found}},
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubGeocoderTestCase(TestCase):
+    """Тесты с геокодером — локальной заглушкой в отдельном потоке."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubGeocoderHandler)
+        cls.server.requested = []
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        host, port = cls.server.server_address
+        cls.geocoder_settings = override_settings(
+            GEOCODER_URL=f'http://{host}:{port}/',
+            GEOCODER_RETRIES=0,
+            GEOCODER_MAX_WORKERS=4,
+        )
+        cls.geocoder_settings.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.geocoder_settings.disable()
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        # сессия создаётся с настройками повторов, поэтому у каждого теста своя
+        geocoder._session = None
+        self.addCleanup(setattr, geocoder, '_session', None)
+        self.server.requested.clear()
+
+
+class GeocoderTests(StubGeocoderTestCase):
+    def test_fetch_coordinates(self):
+        self.assertEqual(fetch_coordinates('Москва, Тверская, 1'),
+                         (37.61, 55.76))
+        self.assertIsNone(fetch_coordinates('Нигде'))
+
+    def test_fetch_coordinates_batch(self):
+        fetched = fetch_coordinates_batch(
+            ['Москва, Тверская, 1', 'Москва, Арбат, 1', 'Нигде', 'Ошибка']
+        )
+        self.assertEqual(fetched, {
+            'Москва, Тверская, 1': (37.61, 55.76),
+            'Москва, Арбат, 1': (37.59, 55.75),
+            'Нигде': None,
+        })
+        self.assertEqual(len(self.server.requested), 4)
+
+
+class GeocodeCacheTests(StubGeocoderTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache = GeocodeCache(maxsize=100, ttl=timedelta(days=90),
+                                  retry_after=60)
+
+    def test_warm_saves_places_in_one_insert(self):
+        addresses = ['Москва, Тверская, 1', 'Москва, Арбат, 1',
+                     'Москва, Мясницкая, 1', 'Нигде']
+        # выборка известных адресов и один bulk_create
+        with self.assertNumQueries(2):
+            self.cache.warm(addresses)
+        self.assertEqual(Place.objects.count(), 4)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.cache.get_coordinates('москва, арбат, 1'),
+                             (37.59, 55.75))
+            self.assertEqual(self.cache.get_coordinates('Нигде'),
+                             (None, None))
+        self.assertEqual(len(self.server.requested), 4)
+
+    def test_geocoder_failure(self):
+        self.cache.warm(['Ошибка'])
+        self.assertEqual(self.cache.get_coordinates('Ошибка'), (None, None))
+        # после неудачи адрес не запрашивается заново до retry_after
+        self.assertEqual(self.server.requested, ['Ошибка'])
+        self.assertFalse(Place.objects.exists())
@@ -1 +1,10 @@
-from .calc_distance import calc_distance
+from .background import geocoding_queue
+from .cache import geocode_cache
+from .geocoder import fetch_coordinates, fetch_coordinates_batch
+
+__all__ = [
+    'fetch_coordinates',
+    'fetch_coordinates_batch',
+    'geocode_cache',
+    'geocoding_queue',
+]
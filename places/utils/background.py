@@ -0,0 +1,96 @@
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from django.db import connection
+
+from places.address import normalize_address
+from .cache import geocode_cache
+
+
+logger = logging.getLogger(__name__)
+
+
+class GeocodingQueue:
+    """
+    Очередь адресов на фоновое геокодирование.
+
+    Адрес кладётся в очередь сразу после регистрации заказа, а фоновый поток
+    пачками геокодирует адреса через `geocode_cache.warm`, так что к моменту,
+    когда менеджер откроет заказ, координаты уже лежат в `Place`.
+
+    Повторно один и тот же адрес, в том числе записанный иначе (см.
+    places.address), в очередь не попадает. Если очередь
+    переполнена, адрес отбрасывается — его геокодирует страница заказов,
+    как и раньше, а регистрация заказа не ждёт геокодер.
+
+    После каждой пачки вызываются подписчики из `add_listener` — так другие
+    приложения узнают, что координаты адресов уже есть.
+    """
+
+    def __init__(self, maxsize, batch_size):
+        self.batch_size = batch_size
+        self._queue = queue.Queue(maxsize)
+        self._pending = set()
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def add_listener(self, listener):
+        """`listener(addresses)` вызывается в фоновом потоке после пачки."""
+        self._listeners.append(listener)
+
+    def enqueue(self, address):
+        """Возвращает False, если адрес не поместился в очередь."""
+        key = normalize_address(address)
+        with self._lock:
+            if key in self._pending:
+                return True
+            try:
+                self._queue.put_nowait(address)
+            except queue.Full:
+                logger.warning('Очередь геокодирования переполнена, '
+                               'адрес %s отброшен', address)
+                return False
+            self._pending.add(key)
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run,
+                                                name='geocoding-queue',
+                                                daemon=True)
+                self._worker.start()
+        return True
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                geocode_cache.warm(batch)
+                for listener in self._listeners:
+                    listener(batch)
+            except Exception:
+                logger.exception('Не удалось геокодировать адреса %s', batch)
+            finally:
+                with self._lock:
+                    self._pending.difference_update(
+                        normalize_address(address) for address in batch
+                    )
+                connection.close()
+
+    def __len__(self):
+        return self._queue.qsize()
+
+
+geocoding_queue = GeocodingQueue(
+    maxsize=settings.GEOCODING_QUEUE_MAXSIZE,
+    batch_size=settings.GEOCODER_MAX_WORKERS,
+)
@@ -0,0 +1,210 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.utils import timezone
+
+from places.address import normalize_address
+from places.metrics import GEOCODE_LOOKUPS
+from places.models import Place
+from .geocoder import fetch_coordinates, fetch_coordinates_batch
+
+
+logger = logging.getLogger(__name__)
+
+
+class GeocodeCache:
+    """
+    Кеш координат адресов в два уровня: LRU-словарь в памяти процесса
+    и таблица `Place` в БД. Поиск адреса — O(1) по нормализованному адресу
+    (см. places.address), так что разные записи одного адреса геокодируются
+    один раз и хранятся в одной строке `Place`.
+
+    Координаты, полученные от геокодера раньше, чем `ttl` назад
+    (по `Place.request_date`), считаются устаревшими и запрашиваются заново.
+    Если геокодер при этом недоступен, отдаются старые координаты, а если
+    их нет — неизвестные (None, None). Адрес, на котором запрос к геокодеру
+    упал, не запрашивается повторно в течение `retry_after` секунд.
+
+    Поиски считаются в метрике GEOCODE_LOOKUPS только в `get_coordinates`.
+    Запись, которую подготовил `warm`, помнит, откуда пришли координаты,
+    и первое чтение засчитывается этому источнику, а следующие — памяти.
+    """
+
+    def __init__(self, maxsize, ttl, retry_after):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.retry_after = retry_after
+        self._entries = OrderedDict()
+        self._failures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _is_fresh(self, request_date):
+        return timezone.localdate() - request_date <= self.ttl
+
+    def _remember(self, place, source='memory'):
+        with self._lock:
+            self._entries[place.normalized_address] = (
+                place.longitude, place.latitude, place.request_date, source
+            )
+            self._entries.move_to_end(place.normalized_address)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def _lookup(self, address):
+        with self._lock:
+            if self._is_cached(address):
+                self._entries.move_to_end(address)
+                entry = self._entries[address]
+                if entry[3] != 'memory':
+                    self._entries[address] = entry[:3] + ('memory',)
+                return entry
+            return None
+
+    def _is_cached(self, address):
+        entry = self._entries.get(address)
+        return entry is not None and self._is_fresh(entry[2])
+
+    def _record_failure(self, address):
+        with self._lock:
+            self._failures[address] = time.monotonic()
+            self._failures.move_to_end(address)
+            while len(self._failures) > self.maxsize:
+                self._failures.popitem(last=False)
+
+    def _failed_recently(self, address):
+        with self._lock:
+            failed_at = self._failures.get(address)
+            if failed_at is None:
+                return False
+            if time.monotonic() - failed_at < self.retry_after:
+                return True
+            del self._failures[address]
+            return False
+
+    def warm(self, addresses):
+        """
+        Готовит кеш к серии вызовов `get_coordinates`: одним запросом
+        подгружает из БД адреса, которых нет в памяти, а новые и устаревшие
+        адреса геокодирует одним параллельным проходом и сохраняет в БД
+        одним `bulk_create` (и одним `bulk_update` для устаревших).
+        """
+        addresses = {normalize_address(address): address for address in addresses}
+        with self._lock:
+            missing = {
+                key for key in addresses
+                if not self._is_cached(key)
+            }
+        if not missing:
+            return
+
+        known_places = {}
+        for place in Place.objects.filter(normalized_address__in=missing):
+            self._remember(place, source='db')
+            known_places[place.normalized_address] = place
+        to_fetch = {
+            key for key in missing
+            if (key not in known_places
+                or not self._is_fresh(known_places[key].request_date))
+            and not self._failed_recently(key)
+        }
+        if not to_fetch:
+            return
+
+        today = timezone.localdate()
+        new_places = []
+        refreshed_places = []
+        fetched = fetch_coordinates_batch(addresses[key] for key in to_fetch)
+        for key in to_fetch:
+            if addresses[key] not in fetched:
+                self._record_failure(key)
+        for address, coordinates in fetched.items():
+            lon, lat = coordinates or (None, None)
+            key = normalize_address(address)
+            place = known_places.get(key)
+            if place is None:
+                new_places.append(Place(longitude=lon, latitude=lat,
+                                        address=address,
+                                        normalized_address=key))
+            else:
+                place.longitude, place.latitude = lon, lat
+                place.request_date = today
+                refreshed_places.append(place)
+        # адрес мог успеть появиться в БД из параллельного запроса
+        Place.objects.bulk_create(new_places, ignore_conflicts=True)
+        Place.objects.bulk_update(refreshed_places,
+                                  ['longitude', 'latitude', 'request_date'])
+        for place in new_places + refreshed_places:
+            self._remember(place, source='geocoder')
+
+    def get_coordinates(self, address):
+        """
+        Возвращает координаты адреса в виде (долгота, широта).
+        Если геокодер адрес не нашёл или недоступен, а старых координат
+        нет, обе координаты равны None.
+        """
+        key = normalize_address(address)
+        entry = self._lookup(key)
+        if entry is not None:
+            GEOCODE_LOOKUPS.labels(source=entry[3]).inc()
+            return entry[:2]
+
+        place = Place.objects.filter(normalized_address=key).first()
+        if place is not None and self._is_fresh(place.request_date):
+            GEOCODE_LOOKUPS.labels(source='db').inc()
+            self._remember(place)
+            return place.longitude, place.latitude
+
+        if self._failed_recently(key):
+            return self._stale_coordinates(place)
+
+        GEOCODE_LOOKUPS.labels(source='geocoder').inc()
+        try:
+            lon, lat = fetch_coordinates(address) or (None, None)
+        except (requests.RequestException, KeyError, ValueError) as exc:
+            logger.warning('Не удалось геокодировать адрес %s: %s',
+                           address, exc)
+            self._record_failure(key)
+            return self._stale_coordinates(place)
+
+        if place is None:
+            place = Place.objects.create(longitude=lon,
+                                         latitude=lat,
+                                         address=address)
+        else:
+            place.longitude, place.latitude = lon, lat
+            place.request_date = timezone.localdate()
+            place.save(update_fields=['longitude', 'latitude', 'request_date'])
+        self._remember(place)
+        return place.longitude, place.latitude
+
+    @staticmethod
+    def _stale_coordinates(place):
+        """Геокодер недоступен: отдаём устаревшие координаты, если они есть."""
+        if place is None:
+            return None, None
+        return place.longitude, place.latitude
+
+    def update(self, place):
+        """Подменяет координаты адреса в памяти, например после правки в админке."""
+        self._remember(place)
+
+    def forget(self, address):
+        with self._lock:
+            self._entries.pop(normalize_address(address), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._failures.clear()
+
+
+geocode_cache = GeocodeCache(
+    maxsize=settings.GEOCODE_CACHE_MAXSIZE,
+    ttl=timedelta(days=settings.GEOCODE_CACHE_TTL_DAYS),
+    retry_after=settings.GEOCODE_RETRY_AFTER,
+)
@@ -0,0 +1,88 @@
+import time
+
+import numpy as np
+from geopy import distance
+
+
+EARTH_RADIUS_KM = distance.EARTH_RADIUS
+
+
+def to_array(coordinates):
+    """
+    Превращает последовательность пар (долгота, широта) в массив формы (n, 2).
+    Неизвестные координаты (None) становятся NaN.
+    """
+    coordinates = [
+        (np.nan, np.nan) if None in point else point
+        for point in coordinates
+    ]
+    return np.array(coordinates, dtype=float).reshape(-1, 2)
+
+
+def haversine_matrix(origins, destinations):
+    """
+    Матрица расстояний в км между всеми парами точек по формуле гаверсинусов,
+    за один векторизованный проход. Точки — массивы (долгота, широта) в
+    градусах. Расстояние до точки с неизвестными координатами — NaN.
+    """
+    origins = np.radians(to_array(origins))
+    destinations = np.radians(to_array(destinations))
+    lon1 = origins[:, 0, np.newaxis]
+    lat1 = origins[:, 1, np.newaxis]
+    lon2 = destinations[np.newaxis, :, 0]
+    lat2 = destinations[np.newaxis, :, 1]
+
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def geodesic_matrix(origins, destinations):
+    """Точная (по эллипсоиду WGS-84) матрица расстояний через geopy."""
+    origins = to_array(origins)
+    destinations = to_array(destinations)
+    matrix = np.full((len(origins), len(destinations)), np.nan)
+    for i, (lon1, lat1) in enumerate(origins):
+        for j, (lon2, lat2) in enumerate(destinations):
+            if np.isnan([lon1, lat1, lon2, lat2]).any():
+                continue
+            matrix[i, j] = distance.geodesic((lat1, lon1), (lat2, lon2)).km
+    return matrix
+
+
+def distance_matrix(origins, destinations, exact=False):
+    if exact:
+        return geodesic_matrix(origins, destinations)
+    return haversine_matrix(origins, destinations)
+
+
+def compare_with_geodesic(origins, destinations):
+    """
+    Сравнивает гаверсинусы с точным расчётом geopy на одних и тех же точках:
+    возвращает максимальную и среднюю ошибку в км и в процентах,
+    а также время обоих расчётов в секундах.
+    """
+    started_at = time.perf_counter()
+    approximate = haversine_matrix(origins, destinations)
+    haversine_time = time.perf_counter() - started_at
+
+    started_at = time.perf_counter()
+    exact = geodesic_matrix(origins, destinations)
+    geodesic_time = time.perf_counter() - started_at
+
+    known = ~np.isnan(exact) & (exact > 0)
+    if not known.any():
+        return None
+    errors = np.abs(approximate[known] - exact[known])
+    relative_errors = errors / exact[known] * 100
+    return {
+        'pairs': int(known.sum()),
+        'max_error_km': float(errors.max()),
+        'mean_error_km': float(errors.mean()),
+        'max_error_percent': float(relative_errors.max()),
+        'mean_error_percent': float(relative_errors.mean()),
+        'haversine_seconds': haversine_time,
+        'geodesic_seconds': geodesic_time,
+    }
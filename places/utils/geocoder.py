@@ -0,0 +1,88 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from places.metrics import GEOCODER_FAILURES, GEOCODER_REQUEST_SECONDS
+
+
+logger = logging.getLogger(__name__)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Общая HTTP-сессия геокодера с пулом соединений и повторами запросов
+    при сетевых ошибках и ответах 429/5xx.
+    """
+    global _session
+    with _session_lock:
+        if _session is not None:
+            return _session
+        retry = Retry(
+            total=settings.GEOCODER_RETRIES,
+            backoff_factor=0.3,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=['GET'],
+        )
+        adapter = HTTPAdapter(max_retries=retry,
+                              pool_maxsize=settings.GEOCODER_MAX_WORKERS)
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        _session = session
+        return _session
+
+
+@GEOCODER_FAILURES.count_exceptions()
+@GEOCODER_REQUEST_SECONDS.time()
+def fetch_coordinates(address):
+    response = get_session().get(settings.GEOCODER_URL, params={
+        "geocode": address,
+        "apikey": settings.GECOCODER_API_KEY,
+        "format": "json",
+    }, timeout=settings.GEOCODER_TIMEOUT)
+    response.raise_for_status()
+    found_places = response.json()['response']['GeoObjectCollection']['featureMember']
+    if not found_places:
+        return None
+    most_relevant = found_places[0]
+    lon, lat = most_relevant['GeoObject']['Point']['pos'].split(" ")
+    return float(lon), float(lat)
+
+
+def fetch_coordinates_batch(addresses, max_workers=None):
+    """
+    Геокодирует адреса параллельно, не более чем в `max_workers` потоков.
+
+    Возвращает словарь {адрес: (долгота, широта)}; для адресов, которые
+    геокодер не нашёл, значение None. Адреса, на которых запрос упал даже
+    после повторов, в словарь не попадают.
+    """
+    addresses = list(addresses)
+    if not addresses:
+        return {}
+    max_workers = min(max_workers or settings.GEOCODER_MAX_WORKERS,
+                      len(addresses))
+
+    def fetch(address):
+        try:
+            return address, fetch_coordinates(address)
+        except (requests.RequestException, KeyError, ValueError) as exc:
+            logger.warning('Не удалось геокодировать адрес %s: %s',
+                           address, exc)
+            return address, False
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(fetch, addresses)
+    return {
+        address: coordinates
+        for address, coordinates in results
+        if coordinates is not False
+    }
@@ -0,0 +1,126 @@
+import math
+import threading
+from collections import defaultdict
+
+from .distance_matrix import EARTH_RADIUS_KM, haversine_matrix
+
+
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+class SpatialIndex:
+    """
+    Сеточный пространственный индекс: точки раскладываются по ячейкам
+    размером `cell_size` градусов, поиск ближайших идёт кольцами ячеек
+    от точки запроса и останавливается, как только следующее кольцо
+    заведомо дальше k-й найденной точки.
+
+    Точки добавляются, перемещаются и удаляются по одной, без перестройки
+    всего индекса.
+    """
+
+    def __init__(self, cell_size=0.05):
+        self.cell_size = cell_size
+        self._points = {}
+        self._cells = defaultdict(set)
+        self._lock = threading.RLock()
+
+    def _cell(self, lon, lat):
+        return (math.floor(lon / self.cell_size),
+                math.floor(lat / self.cell_size))
+
+    def add(self, key, lon, lat):
+        with self._lock:
+            self.remove(key)
+            self._points[key] = (lon, lat)
+            self._cells[self._cell(lon, lat)].add(key)
+
+    def remove(self, key):
+        with self._lock:
+            point = self._points.pop(key, None)
+            if point is None:
+                return
+            cell = self._cell(*point)
+            self._cells[cell].discard(key)
+            if not self._cells[cell]:
+                del self._cells[cell]
+
+    def get(self, key):
+        """Координаты точки (долгота, широта) или None."""
+        return self._points.get(key)
+
+    def __contains__(self, key):
+        return key in self._points
+
+    def __len__(self):
+        return len(self._points)
+
+    def _ring(self, center, radius):
+        x, y = center
+        if radius == 0:
+            yield center
+            return
+        for dx in range(-radius, radius + 1):
+            yield x + dx, y - radius
+            yield x + dx, y + radius
+        for dy in range(-radius + 1, radius):
+            yield x - radius, y + dy
+            yield x + radius, y + dy
+
+    def _ring_min_distance(self, lat, radius):
+        """
+        Нижняя граница расстояния (км) от точки запроса до ячеек кольца
+        `radius`: между ними лежат как минимум `radius - 1` целых колец.
+        """
+        farthest_lat = min(abs(lat) + (radius + 1) * self.cell_size, 90)
+        cell_km = self.cell_size * KM_PER_DEGREE * math.cos(math.radians(farthest_lat))
+        return max(radius - 1, 0) * cell_km
+
+    def _measure(self, lat, lon, cells, predicate):
+        keys = [
+            key
+            for cell in cells
+            for key in self._cells.get(cell, ())
+            if predicate is None or predicate(key)
+        ]
+        if not keys:
+            return []
+        distances = haversine_matrix(
+            [(lon, lat)], [self._points[key] for key in keys]
+        )[0]
+        return list(zip(keys, distances.tolist()))
+
+    def nearest_k(self, lat, lon, k, predicate=None):
+        """
+        До `k` ближайших к точке ключей, для которых `predicate(key)` истинно,
+        в виде списка пар (ключ, расстояние в км) по возрастанию расстояния.
+
+        Как только в очередном кольце ячеек больше, чем всего занятых ячеек,
+        оставшиеся точки перебираются по занятым ячейкам: иначе одна далёкая
+        точка заставила бы обходить тысячи пустых колец.
+        """
+        with self._lock:
+            if not self._cells or k <= 0:
+                return []
+            center = self._cell(lon, lat)
+
+            def ring_of(cell):
+                return max(abs(cell[0] - center[0]), abs(cell[1] - center[1]))
+
+            max_radius = max(ring_of(cell) for cell in self._cells)
+            found = []
+            for radius in range(max_radius + 1):
+                if (len(found) >= k
+                        and found[k - 1][1] <= self._ring_min_distance(lat, radius)):
+                    break
+                if 8 * radius > len(self._cells):
+                    cells = [cell for cell in self._cells
+                             if ring_of(cell) >= radius]
+                    found.extend(self._measure(lat, lon, cells, predicate))
+                    found.sort(key=lambda pair: pair[1])
+                    break
+                found.extend(self._measure(lat, lon,
+                                           self._ring(center, radius),
+                                           predicate))
+                found.sort(key=lambda pair: pair[1])
+            return found[:k]
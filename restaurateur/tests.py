@@ -1,3 +1,140 @@
-from django.test import TestCase
+import json
+from datetime import datetime, timedelta
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from foodcartapp.models import Order, Product, ProductQuantity
+
+from .views import (make_orders_cursor, parse_orders_cursor,
+                    stream_order_events)
+
+
+class OrdersCursorTests(SimpleTestCase):
+    def test_round_trip(self):
+        order = Order(pk=42, registered_at=datetime(2026, 10, 18, 7, 30,
+                                                    tzinfo=timezone.utc))
+        self.assertEqual(parse_orders_cursor(make_orders_cursor(order)),
+                         (order.registered_at, 42))
+
+    def test_invalid(self):
+        for cursor in [None, '', '42', 'вчера,42', '2026-10-18T07:30:00,',
+                       '2026-10-18T07:30:00,abc', '2026-13-40T07:30:00,1']:
+            with self.subTest(cursor=cursor):
+                self.assertIsNone(parse_orders_cursor(cursor))
+
+
+@override_settings(MANAGER_ORDERS_PAGE_SIZE=2)
+class OrdersBoardPaginationTests(TestCase):
+    url = reverse('restaurateur:view_orders')
+
+    @classmethod
+    def setUpTestData(cls):
+        product = Product.objects.create(name='Чизбургер', price=100)
+        registered_at = timezone.now() - timedelta(hours=1)
+        cls.orders = []
+        for number in range(5):
+            order = Order.objects.create(
+                firstname='Иван', lastname='Иванов',
+                phonenumber='+79161234567', address='Москва, Арбат, 1',
+            )
+            ProductQuantity.objects.create(order=order, product=product,
+                                           quantity=1, price=100)
+            # у заказов 1 и 2, 3 и 4 одно время регистрации, и первая
+            # страница кончается посреди такой пары: порядок решает id
+            Order.objects.filter(pk=order.pk).update(
+                registered_at=registered_at
+                + timedelta(minutes=(number + 1) // 2),
+                candidates_stale=False,
+            )
+            cls.orders.append(order)
+        Order.objects.filter(pk=cls.orders[4].pk).update(
+            status=Order.OrderStatus.PROCESSED,
+        )
+        cls.manager = User.objects.create(username='manager', is_staff=True)
+
+    def setUp(self):
+        self.client.force_login(self.manager)
+
+    def get_page(self, cursor=None):
+        data = {'after': cursor} if cursor else {}
+        response = self.client.get(self.url, data)
+        self.assertEqual(response.status_code, 200)
+        return (list(response.context['orders_and_restaurants']),
+                response.context['next_cursor'])
+
+    def test_pages_cover_unprocessed_orders_in_order(self):
+        pages = []
+        cursor = None
+        while True:
+            orders, cursor = self.get_page(cursor)
+            pages.append([order.pk for order in orders])
+            if cursor is None:
+                break
+
+        expected = [order.pk for order in self.orders[:4]]
+        self.assertEqual(pages, [expected[:2], expected[2:]])
+
+    def test_page_queries(self):
+        # сессия, пользователь, страница заказов, их продукты, рестораны
+        with self.assertNumQueries(5):
+            self.get_page()
+
+    def test_next_page_over_ajax(self):
+        _, cursor = self.get_page()
+        response = self.client.get(self.url, {'after': cursor},
+                                   HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertTemplateUsed(response, 'restaurateur/order_rows.html')
+        self.assertTemplateNotUsed(response, 'restaurateur/order_items.html')
+        self.assertEqual(list(response.context['orders_and_restaurants']),
+                         self.orders[2:4])
+
+    def test_invalid_cursor_shows_first_page(self):
+        orders, _ = self.get_page('не курсор')
+        self.assertEqual(orders, self.orders[:2])
+
+
+@override_settings(ORDERS_STREAM_POLL_INTERVAL=0, ORDERS_STREAM_OVERLAP=10)
+class OrdersStreamTests(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(name='Чизбургер', price=100)
+        self.now = timezone.now()
+
+    def create_order(self, seconds_ago):
+        order = Order.objects.create(
+            firstname='Иван', lastname='Иванов',
+            phonenumber='+79161234567', address='Москва, Арбат, 1',
+        )
+        ProductQuantity.objects.create(order=order, product=self.product,
+                                       quantity=1, price=100)
+        Order.objects.filter(pk=order.pk).update(
+            updated_at=self.now - timedelta(seconds=seconds_ago),
+            candidates_stale=False,
+        )
+        return order
+
+    def next_order_ids(self, events):
+        """id заказов из событий до ближайшего keepalive."""
+        order_ids = []
+        for event in events:
+            if event.startswith(': keepalive'):
+                return order_ids
+            if 'event: order' in event:
+                data = event.split('data: ', 1)[1]
+                order_ids.append(json.loads(data)['id'])
+
+    def test_order_committed_behind_cursor(self):
+        first, second = self.create_order(5), self.create_order(3)
+        events = stream_order_events((self.now - timedelta(minutes=1), 0))
+        self.assertEqual(self.next_order_ids(events), [first.pk, second.pk])
+
+        # транзакция заказа зафиксирована позже, чем время его изменения
+        late = self.create_order(4)
+        self.assertEqual(self.next_order_ids(events), [late.pk])
+        self.assertEqual(self.next_order_ids(events), [])
+
+        first.status = Order.OrderStatus.PROCESSED
+        first.save()
+        self.assertEqual(self.next_order_ids(events), [first.pk])
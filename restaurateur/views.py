@@ -1,17 +1,24 @@
-from collections import Counter
+import json
+import time
+from datetime import timedelta
 
 from django import forms
+from django.conf import settings
 from django.contrib.auth import authenticate, login
 from django.contrib.auth import views as auth_views
 from django.contrib.auth.decorators import user_passes_test
+from django.http import StreamingHttpResponse
 from django.shortcuts import redirect, render
+from django.template.loader import render_to_string
 from django.urls import reverse_lazy
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.utils.html import format_html_join
 from django.views import View
 
-from foodcartapp.models import Order, Product, Restaurant, RestaurantMenuItem
-from places.models import Place
-from places.utils import calc_distance
+from foodcartapp.availability import availability_matrix
+from foodcartapp.candidates import get_candidates
+from foodcartapp.models import Order, Product, Restaurant
 
 
 class Login(forms.Form):
@@ -69,21 +76,13 @@ def is_manager(user):
 @user_passes_test(is_manager, login_url='restaurateur:login')
 def view_products(request):
     restaurants = list(Restaurant.objects.order_by('name'))
-    products = list(Product.objects.prefetch_related('menu_items'))
+    products = list(Product.objects.select_related('category'))
 
-    default_availability = {restaurant.id: False for restaurant in restaurants}
-    products_with_restaurants = []
-    for product in products:
-
-        availability = {
-            **default_availability,
-            **{item.restaurant_id: item.availability for item in product.menu_items.all()},
-        }
-        orderer_availability = [availability[restaurant.id] for restaurant in restaurants]
-
-        products_with_restaurants.append(
-            (product, orderer_availability)
-        )
+    availability = availability_matrix.availability_rows(
+        [product.id for product in products],
+        [restaurant.id for restaurant in restaurants],
+    )
+    products_with_restaurants = list(zip(products, availability))
 
     return render(request, template_name="products_list.html", context={
         'products_with_restaurants': products_with_restaurants,
@@ -98,53 +97,169 @@ def view_restaurants(request):
     })
 
 
+def match_restaurants(orders):
+    """
+    Для каждого заказа — HTML-список ближайших ресторанов, которые могут
+    приготовить его целиком. Рестораны берутся из сохранённых заранее
+    (см. foodcartapp.candidates) и подбираются заново только для тех
+    заказов, где они устарели.
+    """
+    return {
+        order: format_html_join(
+            '\n', "<li>{} - {} км</li>",
+            ((restaurant.name, '?' if distance is None else distance)
+             for restaurant, distance in restaurants)
+        )
+        for order, restaurants in get_candidates(orders).items()
+    }
+
+
+def parse_orders_cursor(cursor):
+    """Курсор страницы заказов: «<registered_at в ISO 8601>,<id>»."""
+    if not cursor:
+        return None
+    registered_at, _, pk = cursor.rpartition(',')
+    try:
+        registered_at = parse_datetime(registered_at)
+        pk = int(pk)
+    except ValueError:
+        return None
+    if registered_at is None:
+        return None
+    return registered_at, pk
+
+
+def make_orders_cursor(order):
+    return f'{order.registered_at.isoformat()},{order.pk}'
+
+
 @user_passes_test(is_manager, login_url='restaurateur:login')
 def view_orders(request):
     """
-    Независимо от количества заказов и манипуляций с ними, через контроллер
-    идёт всегда 4 запроса к БД:
-    - получить список всех ресторанов + доступных продуктов в них
-    - получить список всех необработанных заказов
+    Необработанные заказы выводятся страницами по MANAGER_ORDERS_PAGE_SIZE
+    в порядке регистрации. Следующая страница начинается после курсора
+    из параметра `after` (keyset-пагинация по индексу
+    status, registered_at, id), а рестораны читаются только для заказов
+    текущей страницы. AJAX-запрос за следующей страницей получает
+    только строки таблицы.
+
+    Рестораны для заказов подобраны заранее (см. foodcartapp.candidates),
+    поэтому, независимо от количества заказов, через контроллер идёт
+    3 запроса к БД:
+    - получить страницу необработанных заказов
     - получить (через prefetch_related) список
-      всех продуктов в необработанных заказах
-    - получить список локаций, *отфильтрованный* по локациями ресторанов и
-      адресам из всех необработанных заказов, т.е. всю таблицу не берем, т.к.
-      она будет стремительно увеличиваться за счет каждого нового адреса клиента
+      всех продуктов в заказах страницы
+    - получить сохранённые рестораны для заказов страницы
     Дополнительные запросы к БД возможны ИСКЛЮЧИТЕЛЬНО в ситуации, когда
-    появляется адрес (ресторана или в заказе), которого еще нет в БД.
-
-    Тогда количество запросов = 4 + число новых для базы адресов.
+    рестораны для каких-то заказов страницы устарели: поменялись товары
+    или адрес заказа либо наличие его товаров в ресторанах. Тогда для этих
+    заказов рестораны подбираются заново и сохраняются.
     """
-    restaurant_menu = RestaurantMenuItem.objects.get_available_menu()
-    not_processed_orders = list(Order.objects.with_prices(processed=False))
-    restaurant_addreses = set(
-        entry.restaurant.address for entry in restaurant_menu
-    )
-    clients_addreses = {order.address for order in not_processed_orders}
-    places = list(
-        Place.objects.filter(address__in=restaurant_addreses | clients_addreses)
+    stream_since = timezone.now()
+    page_size = settings.MANAGER_ORDERS_PAGE_SIZE
+    orders = (
+        Order.objects.with_products(processed=False)
+        .order_by('registered_at', 'id')
     )
-    orders_and_restaurants = dict()
-    for order in not_processed_orders:
-        restaurants = []
-        for menu in restaurant_menu:
-            if menu.product in order.products.all():
-                restaurants.append(menu.restaurant)
-        else:
-            count = Counter(restaurants)
-            # оставляем только те рестораны, в которых доступны все продукты
-            # из заказа
-            # (проверяем по количеству наименований продуктов в заказе)
-            restaurants = [
-                (r.name, calc_distance(places, r.address, order.address))
-                for r in count if count[r] == order.products.count()
-            ]
-            restaurants.sort(key=lambda x: x[1])
-            orders_and_restaurants[order] = format_html_join(
-                    '\n', "<li>{} - {} км</li>", restaurants
-            )
+    cursor = parse_orders_cursor(request.GET.get('after'))
+    if cursor:
+        orders = orders.after(*cursor)
+    not_processed_orders = list(orders[:page_size + 1])
+    next_cursor = None
+    if len(not_processed_orders) > page_size:
+        not_processed_orders = not_processed_orders[:page_size]
+        next_cursor = make_orders_cursor(not_processed_orders[-1])
+
+    orders_and_restaurants = match_restaurants(not_processed_orders)
+
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        template_name = 'restaurateur/order_rows.html'
+    else:
+        template_name = 'restaurateur/order_items.html'
     return render(
         request,
-        template_name='restaurateur/order_items.html',
-        context={'orders_and_restaurants': orders_and_restaurants}
+        template_name=template_name,
+        context={
+            'orders_and_restaurants': orders_and_restaurants,
+            'next_cursor': next_cursor,
+            'stream_cursor': f'{stream_since.isoformat()},0',
+        }
+    )
+
+
+def stream_order_events(cursor):
+    """
+    Бесконечный поток server-sent events об изменённых заказах.
+
+    Раз в ORDERS_STREAM_POLL_INTERVAL секунд делается один запрос по индексу
+    на `updated_at`; только если что-то изменилось, для изменённых заказов
+    подбираются рестораны. Через ORDERS_STREAM_MAX_AGE секунд поток
+    закрывается, чтобы не держать воркер сервера вечно, — браузер сам
+    переподключится, передав id последнего события в Last-Event-ID.
+
+    `updated_at` ставится до фиксации транзакции, поэтому заказ может
+    появиться в БД уже позади курсора. Чтобы его не потерять, поток
+    перечитывает ORDERS_STREAM_OVERLAP секунд до курсора и пропускает
+    уже отправленные пары (id, updated_at).
+    """
+    deadline = time.monotonic() + settings.ORDERS_STREAM_MAX_AGE
+    overlap = timedelta(seconds=settings.ORDERS_STREAM_OVERLAP)
+    page_size = settings.MANAGER_ORDERS_PAGE_SIZE
+    sent = set()
+    yield f'retry: {settings.ORDERS_STREAM_POLL_INTERVAL * 1000:.0f}\n\n'
+    while time.monotonic() < deadline:
+        window_start = cursor[0] - overlap
+        sent = {
+            (pk, updated_at) for pk, updated_at in sent
+            if updated_at >= window_start
+        }
+        # в окне не больше len(sent) отправленных заказов, поэтому
+        # в выборке найдётся страница неотправленных, если они есть
+        recent = (
+            Order.objects.changed_after(window_start, 0)
+            .values_list('id', 'updated_at')[:len(sent) + page_size]
+        )
+        changed = [key for key in recent if key not in sent][:page_size]
+        orders = Order.objects.with_products().in_bulk(
+            [pk for pk, _ in changed]
+        )
+        changed_orders = [orders[pk] for pk, _ in changed if pk in orders]
+        not_processed_orders = [
+            order for order in changed_orders
+            if order.status == Order.OrderStatus.NOT_PROCESSED
+        ]
+        orders_and_restaurants = match_restaurants(not_processed_orders)
+        for order in changed_orders:
+            html = ''
+            if order in orders_and_restaurants:
+                html = render_to_string('restaurateur/order_rows.html', {
+                    'orders_and_restaurants': {
+                        order: orders_and_restaurants[order]
+                    },
+                })
+            sent.add((order.pk, order.updated_at))
+            cursor = max(cursor, (order.updated_at, order.pk))
+            # id события — курсор, а не сам заказ: опоздавший заказ не
+            # должен отодвигать назад место, с которого продолжит браузер
+            event_id = f'{cursor[0].isoformat()},{cursor[1]}'
+            data = json.dumps({'id': order.pk, 'html': html})
+            yield f'id: {event_id}\nevent: order\ndata: {data}\n\n'
+        if not changed_orders:
+            # комментарий не даёт прокси закрыть простаивающее соединение
+            yield ': keepalive\n\n'
+            time.sleep(settings.ORDERS_STREAM_POLL_INTERVAL)
+
+
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def stream_orders(request):
+    cursor = (
+        parse_orders_cursor(request.headers.get('Last-Event-ID'))
+        or parse_orders_cursor(request.GET.get('after'))
+        or (timezone.now(), 0)
     )
+    response = StreamingHttpResponse(stream_order_events(cursor),
+                                     content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # иначе nginx будет копить события в буфере
+    response['X-Accel-Buffering'] = 'no'
+    return response
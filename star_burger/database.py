@@ -0,0 +1,35 @@
+import dj_database_url
+
+
+POSTGRESQL_ENGINES = {
+    'django.db.backends.postgresql',
+    'django.db.backends.postgresql_psycopg2',
+}
+
+
+def get_database_settings(env, default_url):
+    """
+    Настройки БД по умолчанию: адрес из DATABASE_URL, постоянные соединения
+    и параметры пула из переменных окружения (см. README).
+
+    - DB_CONN_MAX_AGE — сколько секунд держать соединение между запросами,
+      0 — закрывать после каждого запроса;
+    - DB_CONN_HEALTH_CHECKS — проверять постоянное соединение в начале
+      запроса и переоткрывать, если оно оборвалось
+      (см. star_burger.middleware.DatabaseHealthCheckMiddleware);
+    - DB_POOLER — PostgreSQL стоит за пулером вроде PgBouncer в режиме
+      пула транзакций: серверные курсоры тогда не переживают транзакцию,
+      и Django их не использует;
+    - DB_CONNECT_TIMEOUT — таймаут подключения к PostgreSQL в секундах.
+    """
+    database = dj_database_url.config(
+        default=default_url,
+        conn_max_age=env.int('DB_CONN_MAX_AGE', 60),
+    )
+    database['CONN_HEALTH_CHECKS'] = env.bool('DB_CONN_HEALTH_CHECKS', True)
+    if database['ENGINE'] in POSTGRESQL_ENGINES:
+        database.setdefault('OPTIONS', {})['connect_timeout'] = env.int(
+            'DB_CONNECT_TIMEOUT', 5
+        )
+        database['DISABLE_SERVER_SIDE_CURSORS'] = env.bool('DB_POOLER', False)
+    return database
@@ -0,0 +1,31 @@
+import os
+
+from django.http import HttpResponse
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Histogram, generate_latest,
+                               multiprocess)
+
+
+HTTP_REQUEST_SECONDS = Histogram(
+    'starburger_http_request_seconds',
+    'Время ответа на HTTP-запрос',
+    ['view', 'method', 'status'],
+)
+
+
+def is_multiprocess():
+    return bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+
+
+def metrics_view(request):
+    """
+    Метрики в текстовом формате Prometheus. Если задан
+    PROMETHEUS_MULTIPROC_DIR, метрики собираются из файлов всех воркеров
+    gunicorn, а не только из процесса, который принял запрос.
+    """
+    registry = REGISTRY
+    if is_multiprocess():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return HttpResponse(generate_latest(registry),
+                        content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,144 @@
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .metrics import HTTP_REQUEST_SECONDS
+
+
+logger = logging.getLogger(__name__)
+
+# метрики запроса, который сейчас обрабатывается; None — запрос не замеряется
+current_request_metrics = ContextVar('current_request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.db_queries = 0
+        self.db_time = 0
+        self.template_time = 0
+        self.templates = 0
+
+    def record_query(self, execute, sql, params, many, context):
+        started_at = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started_at
+            self.db_queries += 1
+
+    def record_template(self, duration):
+        self.template_time += duration
+        self.templates += 1
+
+
+class RequestMetricsMiddleware:
+    """
+    Замеряет выборку запросов: число запросов к БД и их суммарное время,
+    время ответа представления, время рендеринга шаблонов и размер ответа,
+    и пишет их одной JSON-строкой в лог `star_burger.middleware`.
+
+    Доля замеряемых запросов задаётся REQUEST_METRICS_SAMPLE_RATE; при нуле
+    middleware отключается целиком. Ставится последним в MIDDLEWARE, чтобы
+    время ответа было временем самого представления. Шаблоны замеряет
+    бэкенд star_burger.template_backends.InstrumentedDjangoTemplates.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.REQUEST_METRICS_SAMPLE_RATE
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = current_request_metrics.set(metrics)
+        started_at = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(metrics.record_query)
+                    )
+                response = self.get_response(request)
+        finally:
+            view_time = time.perf_counter() - started_at
+            current_request_metrics.reset(token)
+
+        self.log(request, response, metrics, view_time)
+        return response
+
+    def log(self, request, response, metrics, view_time):
+        match = request.resolver_match
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'view_ms': round(view_time * 1000, 2),
+            'db_queries': metrics.db_queries,
+            'db_ms': round(metrics.db_time * 1000, 2),
+            'templates': metrics.templates,
+            'template_ms': round(metrics.template_time * 1000, 2),
+            'response_bytes': (
+                None if response.streaming else len(response.content)
+            ),
+        }
+        logger.info(json.dumps(record, ensure_ascii=False),
+                    extra={'request_metrics': record})
+
+
+class RequestLatencyMiddleware:
+    """
+    Записывает время ответа на каждый запрос в гистограмму Prometheus
+    с представлением, методом и статусом ответа. Ставится первым
+    в MIDDLEWARE, чтобы учитывать время всех остальных middleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started_at = time.perf_counter()
+        response = self.get_response(request)
+        match = request.resolver_match
+        HTTP_REQUEST_SECONDS.labels(
+            view=match.view_name if match else 'unknown',
+            method=request.method,
+            status=response.status_code,
+        ).observe(time.perf_counter() - started_at)
+        return response
+
+
+class DatabaseHealthCheckMiddleware:
+    """
+    Перед запросом проверяет постоянные соединения с БД, у которых включён
+    CONN_HEALTH_CHECKS, и закрывает оборвавшиеся — например, после
+    перезапуска PostgreSQL или пулера. Django откроет новое соединение
+    при первом запросе к БД, вместо того чтобы упасть на мёртвом.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if not any(connection.settings_dict.get('CONN_HEALTH_CHECKS')
+                   and connection.settings_dict['CONN_MAX_AGE']
+                   for connection in connections.all()):
+            raise MiddlewareNotUsed
+
+    def __call__(self, request):
+        for connection in connections.all():
+            if (connection.settings_dict.get('CONN_HEALTH_CHECKS')
+                    and connection.connection is not None
+                    and not connection.in_atomic_block
+                    and not connection.is_usable()):
+                connection.close()
+        return self.get_response(request)
@@ -1,8 +1,9 @@
 import os
 
-import dj_database_url
 from environs import Env
 
+from .database import get_database_settings
+
 
 env = Env()
 env.read_env()
@@ -30,6 +31,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'star_burger.middleware.RequestLatencyMiddleware',
+    'star_burger.middleware.DatabaseHealthCheckMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -38,13 +41,14 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'star_burger.middleware.RequestMetricsMiddleware',
 ]
 
 ROOT_URLCONF = 'star_burger.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'star_burger.template_backends.InstrumentedDjangoTemplates',
         'DIRS': [
             os.path.join(BASE_DIR, "templates"),
         ],
@@ -63,11 +67,26 @@ TEMPLATES = [
 WSGI_APPLICATION = 'star_burger.wsgi.application'
 
 DATABASES = {
-    'default': dj_database_url.config(
-        default='sqlite:////{0}'.format(os.path.join(BASE_DIR, 'db.sqlite3'))
+    'default': get_database_settings(
+        env,
+        default_url='sqlite:////{0}'.format(os.path.join(BASE_DIR, 'db.sqlite3')),
     )
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+# Cached product catalogue and banners live at most this many seconds. Changes are
+# picked up immediately by the process that made them and within this
+# timeout by the other worker processes
+CATALOGUE_CACHE_TIMEOUT = env.int('CATALOGUE_CACHE_TIMEOUT', 300)
+# Stream the catalogue straight from the database instead of caching it
+# whole in memory, for very large catalogues
+CATALOGUE_STREAMING = env.bool('CATALOGUE_STREAMING', False)
+CATALOGUE_STREAM_CHUNK_SIZE = env.int('CATALOGUE_STREAM_CHUNK_SIZE', 500)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -124,3 +143,53 @@ PHONENUMBER_DEFAULT_FORMAT = 'NATIONAL'
 PHONENUMBER_DEFAULT_REGION = 'RU'
 # Yandex Geocoder API settings
 GECOCODER_API_KEY = env.str('GECOCODER_API_KEY')
+GEOCODER_URL = env.str('GEOCODER_URL', 'https://geocode-maps.yandex.ru/1.x')
+GEOCODER_TIMEOUT = env.float('GEOCODER_TIMEOUT', 5)
+GEOCODER_RETRIES = env.int('GEOCODER_RETRIES', 3)
+GEOCODER_MAX_WORKERS = env.int('GEOCODER_MAX_WORKERS', 8)
+# Geocode cache settings
+GEOCODE_CACHE_MAXSIZE = env.int('GEOCODE_CACHE_MAXSIZE', 10000)
+GEOCODE_CACHE_TTL_DAYS = env.int('GEOCODE_CACHE_TTL_DAYS', 90)
+GEOCODE_RETRY_AFTER = env.float('GEOCODE_RETRY_AFTER', 60)
+# Distances between orders and restaurants: haversine by default,
+# exact geodesic (slow) if enabled
+DISTANCE_EXACT_GEODESIC = env.bool('DISTANCE_EXACT_GEODESIC', False)
+# How many nearest restaurants to show for an order on the manager page
+MANAGER_ORDER_RESTAURANTS_LIMIT = env.int('MANAGER_ORDER_RESTAURANTS_LIMIT', 5)
+# Per-process restaurant index is rebuilt at least this often, so that
+# workers pick up changes made elsewhere even without a shared cache
+RESTAURANT_INDEX_TIMEOUT = env.int('RESTAURANT_INDEX_TIMEOUT', 60)
+# Same for the per-process product/restaurant availability matrix
+AVAILABILITY_MATRIX_TIMEOUT = env.int('AVAILABILITY_MATRIX_TIMEOUT', 60)
+# How many orders to show on one page of the manager orders board
+MANAGER_ORDERS_PAGE_SIZE = env.int('MANAGER_ORDERS_PAGE_SIZE', 50)
+# Live updates of the orders board over server-sent events
+ORDERS_STREAM_POLL_INTERVAL = env.float('ORDERS_STREAM_POLL_INTERVAL', 2)
+ORDERS_STREAM_MAX_AGE = env.int('ORDERS_STREAM_MAX_AGE', 300)
+# updated_at is set before commit, so the stream re-scans this many seconds
+# behind its cursor to catch orders committed late
+ORDERS_STREAM_OVERLAP = env.float('ORDERS_STREAM_OVERLAP', 10)
+# Max number of orders accepted by /api/orders/batch/ in one request
+ORDERS_BATCH_MAX_SIZE = env.int('ORDERS_BATCH_MAX_SIZE', 500)
+# Background geocoding of new orders' addresses
+GEOCODING_IN_BACKGROUND = env.bool('GEOCODING_IN_BACKGROUND', True)
+GEOCODING_QUEUE_MAXSIZE = env.int('GEOCODING_QUEUE_MAXSIZE', 1000)
+# Share of requests whose DB, template and response metrics are logged
+REQUEST_METRICS_SAMPLE_RATE = env.float('REQUEST_METRICS_SAMPLE_RATE', 0)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'star_burger.middleware': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
@@ -0,0 +1,35 @@
+import time
+
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+from .middleware import current_request_metrics
+
+
+class InstrumentedTemplate(Template):
+    def render(self, context=None, request=None):
+        metrics = current_request_metrics.get()
+        if metrics is None:
+            return super().render(context, request)
+        started_at = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.record_template(time.perf_counter() - started_at)
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """
+    Обычный бэкенд шаблонов Django, который добавляет время рендеринга
+    к метрикам текущего запроса (см. star_burger.middleware). Вложенные
+    через include шаблоны входят во время внешнего шаблона.
+    """
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return InstrumentedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)